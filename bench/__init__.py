@@ -0,0 +1 @@
+"""Offline test doubles for benchmark.py and replay.py; not part of the app."""
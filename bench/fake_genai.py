@@ -0,0 +1,249 @@
+"""
+Offline stand-in for the parts of `google.genai.Client` used by the app.
+
+The fake client is scripted: each user message is routed to a flow
+(search, booking, policy or plain text) and the chat streams back real
+`types.GenerateContentResponse` chunks, including function calls, with
+configurable delays. Embeddings are computed locally with a hashed
+bag-of-words so ChromaDB retrieval works without network access.
+"""
+import re
+import math
+import time
+import hashlib
+import threading
+
+from google.genai import types
+
+EMBEDDING_DIM = 256
+
+
+def local_embedding(text: str, dim: int = EMBEDDING_DIM) -> list:
+    """Deterministic, L2-normalised hashed bag-of-words embedding."""
+    vector = [0.0] * dim
+    for token in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeDelays:
+    def __init__(self, first_token=0.3, chunk=0.02, embedding=0.05):
+        self.first_token = first_token
+        self.chunk = chunk
+        self.embedding = embedding
+
+
+class FakeScript:
+    """
+    Decides what the model "says" for a user message.
+
+    `route(message)` returns (function_name, args) when the model should call
+    a tool first, or None for a plain text reply. Follow-up text after a tool
+    result is taken from `followups`.
+    """
+
+    followups = {
+        "search_trains": "Here are the available trains for your route.",
+        "book_ticket": "Your booking is confirmed! Your e-ticket is displayed below.",
+        "retrieve_guidelines": (
+            "According to the railway guidelines, cancellations made 24 hours or more "
+            "before departure receive a 75% refund, and a processing fee applies."
+        ),
+    }
+    default_reply = "Hello! I am RailBot. Where would you like to travel today?"
+
+    def route(self, message: str):
+        text = (message or "").lower()
+
+        selected = re.search(r"train_id=(\d+)", text)
+        if selected and re.search(r"\b(book|seats?)\b", text):
+            return "book_ticket", {
+                "train_id": int(selected.group(1)),
+                "quantity": 1,
+                "name": "Bench User",
+                "mobile": "9999999999",
+                "gender": "M",
+            }
+
+        route = re.search(r"from\s+(\w+)\s+to\s+(\w+)", text)
+        if route:
+            return "search_trains", {
+                "start_station": route.group(1),
+                "end_station": route.group(2),
+            }
+
+        if re.search(r"refund|cancel|luggage|baggage|tatkal|policy|rule", text):
+            return "retrieve_guidelines", {"query": message}
+
+        return None
+
+
+def _text_chunk(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(
+        content=types.Content(role="model", parts=[types.Part(text=text)]))])
+
+
+def _function_call_chunk(name: str, args: dict) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(
+        content=types.Content(role="model", parts=[
+            types.Part(function_call=types.FunctionCall(name=name, args=args))]))])
+
+
+def _split_words(text: str, words_per_chunk: int = 3):
+    words = text.split(" ")
+    for i in range(0, len(words), words_per_chunk):
+        piece = " ".join(words[i:i + words_per_chunk])
+        yield piece + (" " if i + words_per_chunk < len(words) else "")
+
+
+class FakeChat:
+    def __init__(self, client, model, history=None, config=None):
+        self._client = client
+        self.model = model
+        self.history = list(history or [])
+        self.config = config
+
+    def _stream_text(self, text):
+        delays = self._client.delays
+        time.sleep(delays.first_token)
+        for i, piece in enumerate(_split_words(text)):
+            if i:
+                time.sleep(delays.chunk)
+            yield _text_chunk(piece)
+
+    def send_message_stream(self, message):
+        self._client._record("send_message_stream")
+        script = self._client.script
+
+        if isinstance(message, str):
+            call = script.route(message)
+            if call is None:
+                yield from self._stream_text(script.default_reply)
+                return
+            time.sleep(self._client.delays.first_token)
+            yield _function_call_chunk(*call)
+            return
+
+        parts = message if isinstance(message, list) else [message]
+        names = [p.function_response.name for p in parts
+                 if getattr(p, "function_response", None)]
+        text = " ".join(script.followups.get(n, "Done.") for n in names) or "Done."
+        yield from self._stream_text(text)
+
+
+class _FakeChats:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, history=None, config=None):
+        self._client._record("chats.create")
+        return FakeChat(self._client, model, history, config)
+
+
+class _FakeEmbedding:
+    def __init__(self, values):
+        self.values = values
+
+
+class _FakeEmbedResponse:
+    def __init__(self, values):
+        self.embeddings = [_FakeEmbedding(values)]
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def embed_content(self, model, contents, config=None):
+        self._client._record("embed_content")
+        time.sleep(self._client.delays.embedding)
+        return _FakeEmbedResponse(local_embedding(contents))
+
+
+class FakeGenaiClient:
+    """Drop-in replacement for `genai.Client` covering chats and embeddings."""
+
+    def __init__(self, delays: FakeDelays = None, script: FakeScript = None):
+        self.delays = delays or FakeDelays()
+        self.script = script or FakeScript()
+        self.chats = _FakeChats(self)
+        self.models = _FakeModels(self)
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+
+class ReplayChat(FakeChat):
+    """Replays the model turns recorded for one captured session."""
+
+    def __init__(self, client, model, history=None, config=None):
+        super().__init__(client, model, history, config)
+        self._turns = None
+        self._cursor = 0
+
+    def send_message_stream(self, message):
+        self._client._record("send_message_stream")
+
+        if isinstance(message, str):
+            session = self._client.session_for(message)
+            if session is None:
+                yield from self._stream_text(self._client.script.default_reply)
+                return
+            self._turns = session["model_turns"]
+            self._cursor = 0
+
+        if not self._turns or self._cursor >= len(self._turns):
+            yield from self._stream_text("Done.")
+            return
+
+        turn = self._turns[self._cursor]
+        self._cursor += 1
+        speed = self._client.speed
+
+        for entry in turn["chunks"]:
+            time.sleep(entry.get("delay_ms", 0) / 1000 / speed)
+            if entry.get("function_calls"):
+                for call in entry["function_calls"]:
+                    yield _function_call_chunk(call["name"], call["args"])
+            if entry.get("text"):
+                yield _text_chunk(entry["text"])
+
+
+class _ReplayChats(_FakeChats):
+    def create(self, model, history=None, config=None):
+        self._client._record("chats.create")
+        return ReplayChat(self._client, model, history, config)
+
+
+class ReplayGenaiClient(FakeGenaiClient):
+    """
+    Stubbed model that answers each user message with the model turns
+    captured for it (see capture.py), with delays divided by `speed`.
+    Messages that were never captured get the scripted default reply.
+    """
+
+    def __init__(self, sessions, speed=1.0, delays: FakeDelays = None):
+        super().__init__(delays=delays)
+        self.chats = _ReplayChats(self)
+        self.speed = speed
+        self._sessions = {}
+        for session in sessions:
+            key = session["request"]["message"]
+            self._sessions.setdefault(key, []).append(session)
+        self._next = {key: 0 for key in self._sessions}
+
+    def session_for(self, message):
+        key = message.split("\n[SYSTEM:")[0]
+        with self._lock:
+            candidates = self._sessions.get(key)
+            if not candidates:
+                return None
+            index = self._next[key]
+            self._next[key] = (index + 1) % len(candidates)
+            return candidates[index]
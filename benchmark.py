@@ -0,0 +1,239 @@
+"""
+Offline benchmark for /chat/stream.
+
+Runs the real Flask app against SQLite, a local ChromaDB directory and
+the scripted FakeGenaiClient, so no Gemini key or MySQL server is needed.
+
+    python benchmark.py --concurrency 1 4 16 --requests 50 --output bench.json
+
+For every flow (search, booking, policy) and concurrency level it reports
+time to the first event, total stream time, tool latency, DB queries per request
+and requests per second, and writes everything to a JSON file.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+FLOWS = {
+    "search": {"message": "Show me trains from Chennai to CBE"},
+    "booking": {"message": "Book 1 seat for Bench User, M, 9999999999", "train_id": True},
+    "policy": {"message": "What is the refund policy if I cancel my ticket?"},
+}
+
+SEED_TRAINS = [
+    ("Chennai Kovai Express", "Chennai", "CBE", "07:45 PM", "04:15 AM", "08h 30m", 540),
+    ("Cheran Express", "Chennai", "CBE", "10:10 PM", "06:30 AM", "08h 20m", 510),
+    ("Nilgiri Express", "Chennai", "Mettupalayam", "09:15 PM", "06:15 AM", "09h 00m", 480),
+    ("Vaigai Express", "Chennai", "Madurai", "01:40 PM", "09:15 PM", "07h 35m", 390),
+    ("Pandian Express", "Madurai", "Chennai", "09:35 PM", "05:10 AM", "07h 35m", 410),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def prepare_environment(workdir):
+    """Point the app at throwaway storage before it is imported."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["CHROMA_PATH"] = os.path.join(workdir, "chroma_db")
+    os.environ["GUIDELINES_PDF"] = os.path.join(workdir, "missing.pdf")
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    # All benchmark traffic comes from one client; admission limits stay
+    # off unless set explicitly to benchmark overload behaviour.
+    os.environ.setdefault("ADMISSION_RATE", "0")
+    os.environ.setdefault("ADMISSION_MAX_CONCURRENT", "1000")
+    os.environ.setdefault("ADMISSION_MAX_PER_CLIENT", "1000")
+
+
+class Recorder:
+    """
+    Collects tool timings and the DB query count. Chat turns run on their
+    own producer threads, so queries are counted globally and averaged
+    over the requests of each run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tool_latency = {}
+        self.queries = 0
+
+    def count_query(self, *args, **kwargs):
+        with self._lock:
+            self.queries += 1
+
+    def wrap_tool(self, name, func):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.tool_latency.setdefault(name, []).append(elapsed)
+        return timed
+
+
+def install(app, fake_client, recorder, seed_pdf):
+    from sqlalchemy import event
+    from railbot import llm, catalog, booking, retrieval
+    from railbot.models import db, Train
+
+    llm.set_client(llm.ResilientClient(fake_client))
+    for module, name in ((catalog, "search_trains"), (booking, "book_ticket"),
+                         (retrieval, "retrieve_guidelines")):
+        setattr(module, name, recorder.wrap_tool(name, getattr(module, name)))
+
+    with app.app_context():
+        db.create_all()
+        if Train.query.count() == 0:
+            for name, start, end, dep, arr, dur, price in SEED_TRAINS:
+                db.session.add(Train(name=name, start=start, end=end, departure=dep,
+                                     arrival=arr, duration=dur, seats=100000, price=price))
+            db.session.commit()
+        event.listen(db.engine, "before_cursor_execute", recorder.count_query)
+
+    if retrieval.get_collection().count() == 0 and os.path.exists(seed_pdf):
+        delays = fake_client.delays.embedding
+        fake_client.delays.embedding = 0
+        retrieval.pdf_to_chroma(seed_pdf)
+        fake_client.delays.embedding = delays
+
+
+def run_one(app, recorder, flow, train_id):
+    payload = {"message": FLOWS[flow]["message"]}
+    if FLOWS[flow].get("train_id"):
+        payload["train_id"] = train_id
+
+    client = app.test_client()
+    started = time.perf_counter()
+    ttfb = None
+    body = b""
+
+    response = client.post("/chat/stream", json=payload, buffered=False)
+    for data in response.response:
+        body += data if isinstance(data, bytes) else data.encode("utf-8")
+        if ttfb is None and b"data: " in body:
+            ttfb = time.perf_counter() - started
+    response.close()
+    total = time.perf_counter() - started
+
+    events = body.count(b"data: ")
+    ok = response.status_code == 200 and b'"done"' in body
+    return {"ttfb": ttfb or total, "total": total, "events": events, "ok": ok}
+
+
+def run_level(app, recorder, flow, concurrency, requests, train_id):
+    recorder.tool_latency.clear()
+    queries_before = recorder.queries
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: run_one(app, recorder, flow, train_id),
+                                range(requests)))
+    wall = time.perf_counter() - started
+
+    return {
+        "flow": flow,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for r in results if not r["ok"]),
+        "wall_time_s": round(wall, 3),
+        "requests_per_second": round(requests / wall, 2) if wall else None,
+        "ttfb": summarize([r["ttfb"] for r in results]),
+        "stream_time": summarize([r["total"] for r in results]),
+        "tool_latency": {name: summarize(v) for name, v in recorder.tool_latency.items()},
+        "db_queries_per_request": round((recorder.queries - queries_before) / len(results), 2),
+        "sse_events_per_request": round(sum(r["events"] for r in results) / len(results), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline /chat/stream benchmark")
+    parser.add_argument("--flows", nargs="+", choices=list(FLOWS), default=list(FLOWS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=40,
+                        help="requests per flow and concurrency level")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--embedding-delay", type=float, default=0.05)
+    parser.add_argument("--workdir", default=None,
+                        help="directory for the SQLite DB and ChromaDB (default: temp dir)")
+    parser.add_argument("--output", default=None, help="JSON results path")
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="railbot-bench-")
+    prepare_environment(workdir)
+    sys.path.insert(0, here)
+
+    from railbot import create_app
+    from bench.fake_genai import FakeGenaiClient, FakeDelays
+
+    fake_client = FakeGenaiClient(FakeDelays(
+        first_token=args.first_token_delay, chunk=args.chunk_delay,
+        embedding=args.embedding_delay))
+    recorder = Recorder()
+    app = create_app()
+    install(app, fake_client, recorder, os.path.join(here, "railway_guidelines.pdf"))
+
+    with app.app_context():
+        from railbot.models import Train
+        train_id = Train.query.order_by(Train.id).first().id
+
+    runs = []
+    for flow in args.flows:
+        for concurrency in args.concurrency:
+            result = run_level(app, recorder, flow, concurrency,
+                               args.requests, train_id)
+            runs.append(result)
+            print(f"{flow:8s} c={concurrency:<3d} rps={result['requests_per_second']:<8} "
+                  f"ttfb p50={result['ttfb'].get('p50_ms')}ms "
+                  f"total p95={result['stream_time'].get('p95_ms')}ms "
+                  f"queries={result['db_queries_per_request']} errors={result['errors']}")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "settings": {
+            "requests": args.requests,
+            "first_token_delay": args.first_token_delay,
+            "chunk_delay": args.chunk_delay,
+            "embedding_delay": args.embedding_delay,
+        },
+        "model_calls": fake_client.calls,
+        "runs": runs,
+    }
+
+    output = args.output or f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
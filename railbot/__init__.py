@@ -0,0 +1,53 @@
+"""
+RailBot: a Gemini-backed railway booking assistant.
+
+    from railbot import create_app
+    app = create_app()
+
+The Gemini client and the ChromaDB collection are created on first use
+(llm.get_client(), retrieval.get_collection()), so building the app does
+not need network access or an API key.
+"""
+import os
+
+from dotenv import load_dotenv
+
+# Module settings are read from the environment at import time.
+load_dotenv()
+
+from flask import Flask
+from flask_migrate import Migrate
+
+from . import metrics, retrieval, web
+from .models import db
+
+migrate = Migrate()
+
+
+def default_database_uri():
+    user = os.getenv("USER", "root")
+    password = os.getenv("PASSWORD", "")
+    host = os.getenv("HOST", "localhost")
+    db_name = os.getenv("DB_NAME", "railway_db")
+    return os.getenv("DATABASE_URL", f"mysql+pymysql://{user}:{password}@{host}/{db_name}")
+
+
+def create_app(config=None):
+    """Builds the Flask app; `config` overrides the environment-derived settings."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = default_database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    metrics.init_app(app)
+    app.register_blueprint(web.bp)
+
+    @app.cli.command("load-guidelines")
+    def load_guidelines():
+        """Open the guidelines collection, loading the PDF if it is empty."""
+        print("ChromaDB collection count:", retrieval.get_collection().count())
+
+    return app
@@ -0,0 +1,186 @@
+"""
+Admission control for requests that call Gemini.
+
+Each client has a token bucket (ADMISSION_RATE per second, bursts of
+ADMISSION_BURST). Admitted requests then need one of
+ADMISSION_MAX_CONCURRENT global slots and one of ADMISSION_MAX_PER_CLIENT
+per-client slots. When no slot is free they wait in a bounded queue
+(ADMISSION_QUEUE_SIZE) for up to ADMISSION_QUEUE_TIMEOUT seconds. Anything
+that cannot be admitted is rejected early with a Retry-After hint, so a
+spike degrades into 429s for the excess instead of errors for everyone.
+"""
+import os
+import math
+import time
+import threading
+
+from . import metrics
+
+MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "2"))
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+RATE = float(os.getenv("ADMISSION_RATE", "1"))
+BURST = float(os.getenv("ADMISSION_BURST", "5"))
+MAX_TRACKED_CLIENTS = 10000
+
+ADMISSION_TOTAL = metrics.Counter(
+    "railbot_admission_total",
+    "Admission decisions for model-bound requests.",
+    labelnames=("outcome",))
+
+ADMISSION_WAIT_SECONDS = metrics.Histogram(
+    "railbot_admission_wait_seconds",
+    "Time admitted requests spent waiting for a slot.")
+
+IN_FLIGHT = metrics.Gauge(
+    "railbot_admission_in_flight",
+    "Model-bound requests currently holding a slot.")
+
+QUEUED = metrics.Gauge(
+    "railbot_admission_queued",
+    "Requests waiting for a slot.")
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Takes a token, or returns the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Slot:
+    """Held while a request is talking to the model; release exactly once."""
+
+    def __init__(self, controller, client_id):
+        self._controller = controller
+        self._client_id = client_id
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self._client_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_per_client=MAX_PER_CLIENT,
+                 queue_size=QUEUE_SIZE, queue_timeout=QUEUE_TIMEOUT,
+                 rate=RATE, burst=BURST):
+        self.max_concurrent = max_concurrent
+        self.max_per_client = max_per_client
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst
+        self._cond = threading.Condition()
+        self._active = 0
+        self._active_by_client = {}
+        self._waiting = 0
+        self._buckets = {}
+
+    def check_rate(self, client_id):
+        """Applies the per-client token bucket; raises Rejected when empty."""
+        if self.rate <= 0:
+            return
+        with self._cond:
+            bucket = self._buckets.get(client_id)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                    self._prune_buckets()
+                bucket = self._buckets[client_id] = TokenBucket(self.rate, self.burst)
+            wait = bucket.take()
+        if wait:
+            ADMISSION_TOTAL.inc("rate_limited")
+            raise Rejected("Too many requests, please slow down.", wait)
+
+    def _prune_buckets(self):
+        idle = time.monotonic() - self.burst / self.rate
+        for client_id in [c for c, b in self._buckets.items() if b.updated < idle]:
+            del self._buckets[client_id]
+
+    def _can_run(self, client_id):
+        return (self._active < self.max_concurrent
+                and self._active_by_client.get(client_id, 0) < self.max_per_client)
+
+    def acquire(self, client_id):
+        """
+        Returns a Slot once the request may call the model, waiting in the
+        bounded queue if needed. Raises Rejected when the queue is full or
+        the wait deadline passes.
+        """
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+
+        with self._cond:
+            if not self._can_run(client_id):
+                if self._waiting >= self.queue_size:
+                    ADMISSION_TOTAL.inc("queue_full")
+                    raise Rejected("The assistant is busy, please try again shortly.",
+                                   self.queue_timeout)
+
+                self._waiting += 1
+                QUEUED.set(self._waiting)
+                try:
+                    while not self._can_run(client_id):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            ADMISSION_TOTAL.inc("queue_timeout")
+                            raise Rejected("The assistant is busy, please try again shortly.",
+                                           self.queue_timeout)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    QUEUED.set(self._waiting)
+
+            self._active += 1
+            self._active_by_client[client_id] = self._active_by_client.get(client_id, 0) + 1
+            IN_FLIGHT.set(self._active)
+
+        ADMISSION_TOTAL.inc("admitted")
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started)
+        return Slot(self, client_id)
+
+    def _release(self, client_id):
+        with self._cond:
+            self._active -= 1
+            remaining = self._active_by_client.get(client_id, 1) - 1
+            if remaining:
+                self._active_by_client[client_id] = remaining
+            else:
+                self._active_by_client.pop(client_id, None)
+            IN_FLIGHT.set(self._active)
+            self._cond.notify_all()
+
+
+def client_id_for(request):
+    """Identifies the caller; X-Forwarded-For is only trusted behind a proxy."""
+    if os.getenv("ADMISSION_TRUST_PROXY") == "1":
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.remote_addr or "unknown"
@@ -0,0 +1,82 @@
+"""Ticket booking for the book_ticket chat tool."""
+import random
+
+from . import metrics, catalog
+from .models import db, Train
+
+
+@metrics.timed("tool.book_ticket")
+def book_ticket(train_id: int, quantity: int, name: str, mobile: str, gender: str) -> dict:
+    """
+    Books tickets and returns the booking confirmation, or an error status.
+    """
+    train = db.session.get(Train, train_id)
+
+    if not train:
+        return {"status": "error", "message": "Train not found."}
+
+    if train.seats < quantity:
+        return {"status": "error", "message": f"Only {train.seats} seats remaining."}
+
+    train_prefix = train.name[0].upper()
+    assigned_seats = []
+    current_seat_count = train.seats
+
+    for i in range(quantity):
+        seat_num = current_seat_count - i
+        assigned_seats.append(f"{train_prefix}{seat_num}")
+
+    total_cost = train.price * quantity
+    pnr_raw = f"T{train.id}{random.randint(1000, 9999)}{quantity}"
+
+    train.seats -= quantity
+    db.session.commit()
+    catalog.seats_changed(train.id, train.seats)
+
+    return {
+        "status": "success",
+        "pnr": pnr_raw,
+        "passenger": {"name": name, "gender": gender, "mobile": mobile},
+        "train_details": {
+            "name": train.name,
+            "route": f"{train.start} to {train.end}",
+            "timing": f"{train.departure} - {train.arrival}"
+        },
+        "booking_details": {
+            "seats_count": quantity,
+            "seat_numbers": assigned_seats,
+            "total_price": total_cost
+        }
+    }
+
+
+def ticket_card(booking):
+    """The ticket event payload the UI renders for a successful booking."""
+    return {
+        "pnr": booking["pnr"],
+        "passenger": {
+            "name": booking["passenger"]["name"],
+            "gender": booking["passenger"]["gender"],
+            "mobile": booking["passenger"]["mobile"],
+        },
+        "train": {
+            "name": booking["train_details"]["name"],
+            "route": booking["train_details"]["route"],
+            "timing": booking["train_details"]["timing"],
+        },
+        "booking": {
+            "seats": booking["booking_details"]["seats_count"],
+            "seat_numbers": booking["booking_details"]["seat_numbers"],
+            "total_price": booking["booking_details"]["total_price"],
+        }
+    }
+
+
+def ticket_record(booking):
+    """The JSON stored in ChatHistory.booked_ticket."""
+    return {
+        "pnr": booking["pnr"],
+        "passenger": booking["passenger"],
+        "train": booking["train_details"],
+        "booking": booking["booking_details"]
+    }
@@ -0,0 +1,119 @@
+"""
+Opt-in traffic capture for /chat/stream.
+
+Set CAPTURE_PATH to a JSONL file and every chat turn is appended as one
+line: the request payload, each model stream (text chunks and function
+calls with their delays), tool calls with arguments, results and
+timings, and the SSE events sent to the browser. replay.py feeds these
+sessions back through a stubbed model for load testing.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+
+CAPTURE_PATH = os.getenv("CAPTURE_PATH")
+
+_write_lock = threading.Lock()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class SessionCapture:
+    def __init__(self, path, message, train_id):
+        self.path = path
+        self.session = {
+            "id": uuid.uuid4().hex,
+            "timestamp": time.time(),
+            "request": {"message": message, "train_id": train_id},
+            "model_turns": [],
+            "tools": [],
+            "events": [],
+        }
+        self._started = time.perf_counter()
+
+    def _offset(self):
+        return _ms(time.perf_counter() - self._started)
+
+    def model_stream(self, stream):
+        """Passes a model stream through while recording every chunk."""
+        turn = {"started_ms": self._offset(), "chunks": []}
+        self.session["model_turns"].append(turn)
+        last = time.perf_counter()
+
+        for chunk in stream:
+            now = time.perf_counter()
+            entry = {"delay_ms": _ms(now - last)}
+            last = now
+
+            parts = []
+            if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+                parts = chunk.candidates[0].content.parts
+
+            texts = [p.text for p in parts if getattr(p, "text", None)]
+            calls = [{"name": p.function_call.name, "args": dict(p.function_call.args or {})}
+                     for p in parts if getattr(p, "function_call", None)]
+            if texts:
+                entry["text"] = "".join(texts)
+            if calls:
+                entry["function_calls"] = calls
+            if not parts and chunk.text:
+                entry["text"] = chunk.text
+
+            turn["chunks"].append(entry)
+            yield chunk
+
+    def tool(self, name, args, result, seconds):
+        self.session["tools"].append({
+            "at_ms": self._offset(),
+            "name": name,
+            "args": dict(args or {}),
+            "result": result,
+            "duration_ms": _ms(seconds),
+        })
+
+    def event(self, event_type, content):
+        self.session["events"].append({"at_ms": self._offset(), "type": event_type,
+                                       "content": content})
+
+    def finish(self):
+        self.session["duration_ms"] = self._offset()
+        line = json.dumps(self.session, default=str)
+        with _write_lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class _NullCapture:
+    def model_stream(self, stream):
+        return stream
+
+    def tool(self, name, args, result, seconds):
+        pass
+
+    def event(self, event_type, content):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_CAPTURE = _NullCapture()
+
+
+def start_session(message, train_id=None):
+    """Returns a SessionCapture when CAPTURE_PATH is set, otherwise a no-op."""
+    if not CAPTURE_PATH:
+        return NULL_CAPTURE
+    return SessionCapture(CAPTURE_PATH, message, train_id)
+
+
+def load_sessions(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,137 @@
+"""
+Train catalog: direct and multi-leg route search for the chat tools and
+fast path, the station index used by the intent router, and the route
+summary for the system prompt.
+
+Route searches are served through a RouteCache and connections through a
+ConnectionIndex. Call seats_changed() after a booking, train_saved() or
+train_deleted() after single-train edits, and catalog_changed() after bulk
+changes.
+"""
+from . import metrics, intent_router, connections
+from .models import db, Train
+from .route_cache import RouteCache, normalize_station
+
+
+def train_to_dict(train):
+    return {
+        "train_id": train.id,
+        "name": train.name,
+        "start": train.start,
+        "end": train.end,
+        "departure": train.departure,
+        "arrival": train.arrival,
+        "duration": train.duration,
+        "seats": train.seats,
+        "price": train.price
+    }
+
+
+@metrics.timed("tool.search_trains")
+def search_trains(start_station: str, end_station: str) -> dict:
+    """
+    Searches for trains between two stations.
+    Returns {"status": "success", "count", "trains"} or an error status.
+    """
+    start_station = normalize_station(start_station)
+    end_station = normalize_station(end_station)
+    if not start_station or not end_station:
+        # An empty name would match every station in the ilike filter.
+        return _no_trains(start_station, end_station)
+    return route_cache.get_or_load(
+        start_station, end_station, lambda: _query_route(start_station, end_station))
+
+
+def _no_trains(start_station, end_station):
+    return {
+        "status": "error",
+        "message": f"No trains found from {start_station} to {end_station}"
+    }
+
+
+def _query_route(start_station, end_station):
+    trains = Train.query.filter(
+        Train.start.ilike(f"%{start_station}%"),
+        Train.end.ilike(f"%{end_station}%")
+    ).all()
+
+    if not trains:
+        return _no_trains(start_station, end_station)
+
+    train_list = [train_to_dict(train) for train in trains]
+    return {
+        "status": "success",
+        "count": len(train_list),
+        "trains": train_list
+    }
+
+
+@metrics.timed("tool.find_connections")
+def find_connections(start_station: str, end_station: str, max_results: int = 3) -> dict:
+    """
+    Finds the fastest journeys with changes between two stations.
+    Returns {"status": "success", "count", "journeys"} or an error status.
+    """
+    journeys = connection_index.search(start_station, end_station, k=max_results)
+    if not journeys:
+        return {
+            "status": "error",
+            "message": f"No connections found from {start_station} to {end_station}"
+        }
+
+    return {
+        "status": "success",
+        "count": len(journeys),
+        "journeys": [connections.describe(journey) for journey in journeys]
+    }
+
+
+def route_summary():
+    trains = Train.query.all()
+
+    train_summary = f"Total trains in system: {len(trains)}\n"
+    unique_routes = set()
+    for t in trains:
+        unique_routes.add(f"{t.start} → {t.end}")
+
+    return train_summary + "Available routes:\n" + "\n".join(unique_routes)
+
+
+def load_station_names():
+    rows = db.session.query(Train.start, Train.end).distinct().all()
+    return {name for row in rows for name in row}
+
+
+def load_trains():
+    return [train_to_dict(train) for train in Train.query.all()]
+
+
+station_index = intent_router.StationIndex(load_station_names)
+route_cache = RouteCache()
+connection_index = connections.ConnectionIndex(load_trains)
+
+
+def seats_changed(train_id, seats):
+    """Keeps cached search results in step with a committed seat count."""
+    route_cache.update_seats(train_id, seats)
+    connection_index.update_seats(train_id, seats)
+
+
+def train_saved(train):
+    """Call after adding or editing one train."""
+    station_index.invalidate()
+    route_cache.clear()
+    connection_index.upsert(train_to_dict(train))
+
+
+def train_deleted(train_id):
+    station_index.invalidate()
+    route_cache.clear()
+    connection_index.remove(train_id)
+
+
+def catalog_changed():
+    """Drops everything derived from the trains table."""
+    station_index.invalidate()
+    route_cache.clear()
+    connection_index.invalidate()
@@ -0,0 +1,456 @@
+"""
+One chat turn: the rule-based fast path, the Gemini session with its
+tools, and the bounded tool loop that turns the model stream into
+(event_type, content) pairs for the SSE writer.
+
+Tool results are kept on the ChatTurn rather than in module globals, so
+concurrent turns never see each other's searches or bookings.
+"""
+import os
+import json
+import time
+from functools import lru_cache
+
+from . import metrics, intent_router, llm, catalog, booking, retrieval
+from .models import db, Train, ChatHistory
+
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "4"))
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "60"))
+
+TOOL_ROUNDS = metrics.Histogram(
+    "railbot_agent_tool_rounds",
+    "Tool rounds used per chat turn.",
+    buckets=(0, 1, 2, 3, 4, 6, 8))
+
+FAST_PATH_TOTAL = metrics.Counter(
+    "railbot_fast_path_total",
+    "Chat turns answered by the rule-based router without calling Gemini.",
+    labelnames=("intent",))
+
+
+@metrics.timed("system_instruction")
+def get_system_instruction():
+    train_summary = catalog.route_summary()
+
+    return f"""
+# ROLE & PERSONA
+You are RailBot, the official Digital Concierge. You are professional and proactive.
+- Privacy: NEVER show train_id or DB_ID to the user.
+
+# SYSTEM INFO
+{train_summary}
+
+# CORE LOGIC & FLOW
+
+## 1. Greeting
+Use the user's name if provided. If not, introduce yourself as a railway assistant.
+
+## 2. Route Discovery & Train Search
+1. When user asks about trains or wants to travel, ask for Start and End stations if not provided.
+2. **MANDATORY**: Use the `search_trains` tool to find available trains.
+3. **NEVER** list trains in text or markdown. The UI will display train cards automatically.
+4. After calling `search_trains`, simply say: "Here are the available trains for your route." Do NOT ask for passenger details yet.
+5. If there is no direct train, `search_trains` returns connecting journeys under "connections" (or call `find_connections`). These are not shown as cards, so briefly describe each option: train names, where to change, departure, arrival and total duration. When the user picks one, book every leg with `book_ticket`, using each leg's train_id.
+
+## 3. Booking Workflow
+1. **After train is selected**: Immediately ask for Name, Gender, Mobile, and Number of Seats.
+2. **IMPORTANT**: When you see "[SYSTEM: User has selected train_id=X]" in the message, the user has ALREADY selected their train. DO NOT ask them to select again.
+3. **Collect remaining info**: If train is already selected, just collect any missing passenger details.
+4. **Tool Call**: Once you have train_id (from SYSTEM message) AND all passenger details (name, gender, mobile, seats), immediately call `book_ticket`.
+5. **Validation**: Only confirm if the tool returns a "success" status.
+
+## 4. After Booking Success
+When `book_ticket` returns success, simply say: "Your booking is confirmed! Your e-ticket is displayed below."
+DO NOT display ticket details in text. The UI will automatically show a formatted ticket card.
+
+## 5. Policy & Guidelines Questions
+- When a user asks about railway rules, cancellations, refunds, luggage, delays, concessions, complaints, or ANY policy-related topic, you MUST call the `retrieve_guidelines` tool with the user's question as the query.
+- Answer ONLY using what the tool returns. Do NOT make up policy information.
+- If the tool returns no relevant results, say: "I'm sorry, I don't have that information. Please contact railway support."
+
+# CRITICAL RULES
+- If you see train_id in a SYSTEM message, the user has already selected. Never ask "please select your train"
+- Collect passenger details (name, gender, mobile, seats) immediately after showing trains
+- Once you have ALL details including train_id, call book_ticket immediately
+- Never mention train_id, DB_ID, or technical details to users
+
+# CONVERSATION STYLE
+- Be warm, helpful, and concise
+- Keep responses conversational, not robotic
+- Don't repeat yourself
+"""
+
+
+@lru_cache(maxsize=1)
+def railway_tool():
+    """Function declarations for the model; built once, on the first model turn."""
+    from google.genai import types
+
+    search_trains_declaration = types.FunctionDeclaration(
+        name="search_trains",
+        description="Searches for trains between two stations and returns a JSON array of train details.",
+        parameters={
+            "type": "object",
+            "properties": {
+                "start_station": {
+                    "type": "string",
+                    "description": "The starting station name"
+                },
+                "end_station": {
+                    "type": "string",
+                    "description": "The destination station name"
+                }
+            },
+            "required": ["start_station", "end_station"]
+        }
+    )
+
+    book_ticket_declaration = types.FunctionDeclaration(
+        name="book_ticket",
+        description="Books train tickets and returns a JSON object with booking confirmation.",
+        parameters={
+            "type": "object",
+            "properties": {
+                "train_id": {
+                    "type": "integer",
+                    "description": "The ID of the train to book"
+                },
+                "quantity": {
+                    "type": "integer",
+                    "description": "Number of seats to book"
+                },
+                "name": {
+                    "type": "string",
+                    "description": "Passenger name"
+                },
+                "mobile": {
+                    "type": "string",
+                    "description": "Passenger mobile number"
+                },
+                "gender": {
+                    "type": "string",
+                    "description": "Passenger gender (M/F/Other)"
+                }
+            },
+            "required": ["train_id", "quantity", "name", "mobile", "gender"]
+        }
+    )
+
+    find_connections_declaration = types.FunctionDeclaration(
+        name="find_connections",
+        description=(
+            "Finds the fastest journeys with one or more changes between two stations, "
+            "for routes without a direct train."
+        ),
+        parameters={
+            "type": "object",
+            "properties": {
+                "start_station": {
+                    "type": "string",
+                    "description": "The starting station name"
+                },
+                "end_station": {
+                    "type": "string",
+                    "description": "The destination station name"
+                },
+                "max_results": {
+                    "type": "integer",
+                    "description": "How many journeys to return (default 3)"
+                }
+            },
+            "required": ["start_station", "end_station"]
+        }
+    )
+
+    retrieve_guidelines_declaration = types.FunctionDeclaration(
+        name="retrieve_guidelines",
+        description=(
+            "Search the official railway policy PDF for rules, guidelines, and information. "
+            "Call this whenever the user asks about: cancellations, refunds, luggage/baggage rules, "
+            "train delays, compensation, concessions , complaints, helpline, "
+            "tatkal booking, waitlisted tickets, seat reservations, berth types, fare rules, "
+            "or ANY other railway policy or regulation topic."
+        ),
+        parameters={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "The user's question to search for in the railway guidelines"
+                }
+            },
+            "required": ["query"]
+        }
+    )
+
+    return types.Tool(
+        function_declarations=[search_trains_declaration, find_connections_declaration,
+                               book_ticket_declaration, retrieve_guidelines_declaration]
+    )
+
+
+def fast_path_reply(user_input, train_id=None):
+    """
+    Answers unambiguous route searches and train selections without Gemini.
+    Returns (intent, reply_text, search_result) or None to fall back to the model.
+    """
+    with metrics.span("fast_path"):
+        if train_id:
+            train = db.session.get(Train, train_id)
+            intent = intent_router.detect_selection(
+                user_input, train_id, train.name if train else None)
+            if not intent:
+                return None
+            reply = (f"Great choice! To book your tickets on {train.name}, please share the "
+                     "passenger's name, gender, mobile number and the number of seats.")
+            return intent.name, reply, None
+
+        intent = intent_router.detect_route(user_input, catalog.station_index)
+        if not intent:
+            return None
+
+        result = catalog.search_trains(**intent.args)
+        if result.get("status") != "success":
+            return None
+        return intent.name, "Here are the available trains for your route.", result
+
+
+def create_chat_session(user_message, train_id=None):
+    from google.genai import types
+
+    with metrics.span("history_load"):
+        past_chats = ChatHistory.query.order_by(
+            ChatHistory.id.desc()).limit(6).all()
+    history_for_gemini = []
+
+    for chat in reversed(past_chats):
+        history_for_gemini.append(types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=chat.user)]))
+        history_for_gemini.append(types.Content(
+            role="model",
+            parts=[types.Part.from_text(text=chat.bot)]))
+
+    if train_id:
+        user_message_with_context = f"{user_message}\n[SYSTEM: User has selected train_id={train_id}. Use this train_id for booking.]"
+    else:
+        user_message_with_context = user_message
+
+    system_instruction = get_system_instruction()
+
+    # Only builds a ResilientChat; the real create is timed as chat_create
+    # when the first message is sent.
+    chat_session = llm.get_client().chats.create(
+        model=llm.PRIMARY_MODEL,
+        history=history_for_gemini,
+        config=types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            tools=[railway_tool()],
+            temperature=0.7
+        )
+    )
+
+    return chat_session, user_message_with_context
+
+
+def save_history(user_input, bot, booked_ticket=None, train_results=None):
+    new_chat = ChatHistory(
+        user=user_input,
+        bot=bot,
+        booked_ticket=booked_ticket,
+        train_results=train_results
+    )
+    with metrics.span("history_commit"):
+        db.session.add(new_chat)
+        db.session.commit()
+
+
+class ChatTurn:
+    """
+    Runs one user message to completion. `events()` yields (event_type,
+    content) pairs; call `close()` afterwards to release background work.
+    """
+
+    def __init__(self, user_input, train_id, session_capture):
+        self.user_input = user_input
+        self.train_id = train_id
+        self.capture = session_capture
+        self.search_result = None
+        self.booking_results = []
+        self.prefetch = None
+
+    def events(self, fast=None):
+        if fast:
+            yield from self._fast_path_events(fast)
+        else:
+            yield from self._model_events()
+
+    def close(self):
+        if self.prefetch is not None:
+            self.prefetch.discard()
+
+    def _fast_path_events(self, fast):
+        intent, reply, search_result = fast
+        FAST_PATH_TOTAL.inc(intent)
+
+        yield "text", reply
+
+        trains_json = None
+        if search_result:
+            yield "trains", search_result['trains']
+            trains_json = json.dumps(search_result["trains"])
+
+        yield "done", None
+
+        save_history(self.user_input, reply, train_results=trains_json)
+
+    def _execute_tool(self, func_call):
+        from google.genai import types
+
+        name = func_call.name
+        args = func_call.args or {}
+        started = time.perf_counter()
+
+        if name == "search_trains":
+            result = catalog.search_trains(
+                args.get("start_station"), args.get("end_station"))
+            self.search_result = result if result.get("status") == "success" else None
+            if not self.search_result:
+                # Saves the model a round trip to find_connections.
+                found = catalog.find_connections(
+                    args.get("start_station"), args.get("end_station"))
+                if found.get("status") == "success":
+                    result = dict(result, connections=found["journeys"])
+            response = {"result": json.dumps(result)}
+
+        elif name == "find_connections":
+            result = catalog.find_connections(
+                args.get("start_station"), args.get("end_station"),
+                max(1, min(int(args.get("max_results") or 3), 5)))
+            response = {"result": json.dumps(result)}
+
+        elif name == "book_ticket":
+            result = booking.book_ticket(
+                args.get("train_id"), args.get("quantity"),
+                args.get("name"), args.get("mobile"), args.get("gender")
+            )
+            if result.get("status") == "success":
+                self.booking_results.append(result)
+            response = {"result": json.dumps(result)}
+
+        elif name == "retrieve_guidelines":
+            response = {"context": self.prefetch.take(args.get("query", ""))}
+
+        else:
+            response = {"error": f"Unknown tool: {name}"}
+
+        self.capture.tool(name, args, response, time.perf_counter() - started)
+        return types.Part.from_function_response(name=name, response=response)
+
+    def _run_tools(self, func_calls, round_number):
+        """Executes one round of function calls, streaming tool_start/tool_end events."""
+        from google.genai import types
+
+        response_parts = []
+        seen = {}
+
+        for fc in func_calls:
+            key = (fc.name, json.dumps(dict(fc.args or {}), sort_keys=True, default=str))
+            if key in seen:
+                response_parts.append(seen[key])
+                continue
+
+            yield "tool_start", {"name": fc.name, "round": round_number}
+            started = time.perf_counter()
+            try:
+                part = self._execute_tool(fc)
+                status = "success"
+            except Exception as e:
+                print(f"[Tool] {fc.name} failed: {e}")
+                part = types.Part.from_function_response(
+                    name=fc.name, response={"error": f"{fc.name} failed. Please try again."})
+                status = "error"
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            yield "tool_end", {"name": fc.name, "round": round_number,
+                               "status": status, "duration_ms": duration_ms}
+
+            seen[key] = part
+            response_parts.append(part)
+
+        return response_parts
+
+    def _model_events(self):
+        self.prefetch = retrieval.GuidelinePrefetch(self.user_input)
+
+        chat_session, user_message_with_context = create_chat_session(
+            self.user_input, self.train_id)
+
+        full_response = ""
+        deadline = time.monotonic() + TURN_DEADLINE_SECONDS
+        message = user_message_with_context
+        rounds = 0
+
+        while True:
+            func_calls = []
+            timed_out = False
+            stream = self.capture.model_stream(
+                chat_session.send_message_stream(message, deadline=deadline))
+
+            try:
+                for chunk in metrics.timed_stream(stream, "model.first_token", "model.stream"):
+                    parts = []
+
+                    if chunk.candidates and chunk.candidates[0].content.parts:
+                        parts = chunk.candidates[0].content.parts
+
+                    for part in parts:
+                        if hasattr(part, 'text') and part.text:
+                            full_response += part.text
+                            yield "text", part.text
+
+                        elif hasattr(part, 'function_call') and part.function_call:
+                            func_calls.append(part.function_call)
+
+                    if not parts and chunk.text:
+                        full_response += chunk.text
+                        yield "text", chunk.text
+            except llm.TurnDeadlineExceeded:
+                # Covers streams that stall as well as ones still sending.
+                timed_out = True
+
+            if not func_calls and not timed_out:
+                break
+
+            if timed_out or rounds >= MAX_TOOL_ROUNDS or time.monotonic() > deadline:
+                print(f"[Agent] Stopping after {rounds} tool rounds "
+                      f"({'round limit' if rounds >= MAX_TOOL_ROUNDS and not timed_out else 'deadline'})")
+                notice = "Sorry, this is taking longer than expected. Please try again in a moment."
+                full_response += ("\n\n" if full_response else "") + notice
+                yield "text", notice
+                break
+
+            rounds += 1
+            response_parts = yield from self._run_tools(func_calls, rounds)
+            message = response_parts if len(response_parts) > 1 else response_parts[0]
+
+        TOOL_ROUNDS.observe(rounds)
+
+        for booking_result in self.booking_results:
+            yield "ticket", booking.ticket_card(booking_result)
+
+        if self.search_result:
+            yield "trains", self.search_result['trains']
+
+        yield "done", None
+
+        ticket_json = None
+        trains_json = None
+
+        if self.booking_results:
+            # History keeps one ticket per message; multi-leg trips store the last leg.
+            ticket_json = json.dumps(booking.ticket_record(self.booking_results[-1]))
+
+        if self.search_result:
+            trains_json = json.dumps(self.search_result["trains"])
+
+        save_history(self.user_input, full_response, ticket_json, trains_json)
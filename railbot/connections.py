@@ -0,0 +1,312 @@
+"""
+Multi-leg journeys for routes without a direct train.
+
+Every train is one daily connection (start -> end). The timetable is
+unrolled over enough days to cover MAX_JOURNEY_HOURS and kept sorted by
+departure. Each query is a single backward connection scan (profile CSA):
+every station collects, per number of trains, the journeys to the
+destination that no journey with as few trains beats on both departure
+and arrival. A change needs MIN_TRANSFER_MINUTES at the same station and
+journeys are capped at MAX_LEGS trains, so a slow journey with few
+changes is kept next to a faster one that could not be extended. The k
+fastest journeys leaving the origin are returned.
+
+ConnectionIndex is rebuilt lazily after `invalidate()` or once the TTL
+has passed, and `upsert()` / `remove()` patch single trains in place.
+"""
+import os
+import re
+import copy
+import time
+import bisect
+import threading
+from collections import namedtuple
+
+MIN_TRANSFER_MINUTES = int(os.getenv("MIN_TRANSFER_MINUTES", "30"))
+MAX_JOURNEY_HOURS = float(os.getenv("MAX_JOURNEY_HOURS", "36"))
+MAX_LEGS = int(os.getenv("MAX_LEGS", "3"))
+CONNECTION_INDEX_TTL = 300
+MINUTES_PER_DAY = 24 * 60
+
+_TIME_RE = re.compile(r"^\s*(\d{1,2})[:.](\d{2})\s*([ap]\.?m\.?)?\s*$", re.IGNORECASE)
+_DURATION_RE = re.compile(r"^\s*(?:(\d+)\s*h(?:rs?|ours?)?)?\s*(?:(\d+)\s*m(?:in(?:s|utes?)?)?)?\s*$",
+                          re.IGNORECASE)
+
+Leg = namedtuple("Leg", ["train_id", "origin", "destination", "departs", "travel", "train"])
+
+
+def parse_clock(value):
+    """'07:45 PM' or '19:45' -> minutes after midnight, or None."""
+    match = _TIME_RE.match(value or "")
+    if not match:
+        return None
+    hours, minutes, meridiem = int(match.group(1)), int(match.group(2)), match.group(3)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem[0].lower() == "p" else 0)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def parse_duration(value):
+    """'08h 30m' -> 510, or None."""
+    match = _DURATION_RE.match(value or "")
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    return int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+
+
+def format_clock(minutes):
+    day, minute = divmod(minutes, MINUTES_PER_DAY)
+    hours, mins = divmod(minute, 60)
+    label = f"{hours % 12 or 12:02d}:{mins:02d} {'AM' if hours < 12 else 'PM'}"
+    if day:
+        label += f" (+{day} day{'s' if day > 1 else ''})"
+    return label
+
+
+def format_duration(minutes):
+    return f"{minutes // 60:02d}h {minutes % 60:02d}m"
+
+
+def station_key(name):
+    return " ".join((name or "").split()).casefold()
+
+
+def make_leg(train):
+    """Builds a Leg from a catalog train dict, or None if its times can't be parsed."""
+    departs = parse_clock(train.get("departure"))
+    if departs is None:
+        return None
+    travel = parse_duration(train.get("duration"))
+    if travel is None:
+        arrives = parse_clock(train.get("arrival"))
+        if arrives is None:
+            return None
+        travel = (arrives - departs) % MINUTES_PER_DAY
+    if travel <= 0:
+        return None
+    return Leg(train["train_id"], station_key(train["start"]), station_key(train["end"]),
+               departs, travel, train)
+
+
+def _unrolled(leg, days):
+    for day in range(days):
+        departs = leg.departs + day * MINUTES_PER_DAY
+        yield (departs, departs + leg.travel, leg.train_id)
+
+
+class _Timetable:
+    """An immutable snapshot; updates build a new one so searches never lock."""
+
+    def __init__(self, legs, days):
+        self.legs = legs
+        self.days = days
+        self.stations = {}
+        self.by_origin = {}
+        connections = []
+        for leg in legs.values():
+            self.stations.setdefault(leg.origin, leg.train["start"])
+            self.stations.setdefault(leg.destination, leg.train["end"])
+            self.by_origin.setdefault(leg.origin, []).append(leg)
+            connections.extend(_unrolled(leg, days))
+        connections.sort()
+        self.connections = connections
+
+    def patched(self, train_id, leg):
+        """
+        A copy with one train replaced (or removed if `leg` is None). The
+        train's connections are moved with bisect instead of re-sorting the
+        whole unrolled timetable.
+        """
+        timetable = copy.copy(self)
+        timetable.legs = dict(self.legs)
+        timetable.stations = dict(self.stations)
+        timetable.by_origin = dict(self.by_origin)
+        timetable.connections = connections = list(self.connections)
+
+        old = timetable.legs.pop(train_id, None)
+        if old is not None:
+            remaining = [other for other in self.by_origin[old.origin] if other.train_id != train_id]
+            if remaining:
+                timetable.by_origin[old.origin] = remaining
+            else:
+                del timetable.by_origin[old.origin]
+            for connection in _unrolled(old, self.days):
+                del connections[bisect.bisect_left(connections, connection)]
+
+        if leg is not None:
+            timetable.legs[train_id] = leg
+            timetable.stations.setdefault(leg.origin, leg.train["start"])
+            timetable.stations.setdefault(leg.destination, leg.train["end"])
+            timetable.by_origin[leg.origin] = timetable.by_origin.get(leg.origin, []) + [leg]
+            for connection in _unrolled(leg, self.days):
+                bisect.insort(connections, connection)
+        return timetable
+
+
+class ConnectionIndex:
+    def __init__(self, loader, ttl=CONNECTION_INDEX_TTL, min_transfer=MIN_TRANSFER_MINUTES,
+                 max_journey_hours=MAX_JOURNEY_HOURS, max_legs=MAX_LEGS):
+        self._loader = loader
+        self._ttl = ttl
+        self.min_transfer = min_transfer
+        self.horizon = int(max_journey_hours * 60)
+        self.max_legs = max_legs
+        self._days = (MINUTES_PER_DAY + self.horizon) // MINUTES_PER_DAY + 1
+        self._lock = threading.Lock()
+        self._timetable = None
+        self._loaded_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _current(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self._ttl:
+                legs = {}
+                for train in self._loader():
+                    leg = make_leg(train)
+                    if leg is not None:
+                        legs[leg.train_id] = leg
+                self._timetable = _Timetable(legs, self._days)
+                self._loaded_at = time.monotonic()
+            return self._timetable
+
+    def _patch(self, train_id, leg):
+        # Build the new snapshot outside the lock so searches aren't held up;
+        # if another patch or reload swapped in a snapshot meanwhile, redo it.
+        while True:
+            with self._lock:
+                base = self._timetable
+                if base is None or self._loaded_at is None:
+                    return
+            timetable = base.patched(train_id, leg)
+            with self._lock:
+                if self._timetable is base:
+                    self._timetable = timetable
+                    return
+
+    def upsert(self, train):
+        """Adds or replaces one train (a catalog train dict)."""
+        self._patch(train["train_id"], make_leg(train))
+
+    def remove(self, train_id):
+        self._patch(train_id, None)
+
+    def update_seats(self, train_id, seats):
+        with self._lock:
+            leg = self._timetable.legs.get(train_id) if self._timetable else None
+            if leg is not None:
+                leg.train["seats"] = seats
+
+    def resolve(self, name, timetable=None):
+        """Station keys containing `name`, matching search_trains' substring rule."""
+        needle = station_key(name)
+        if not needle:
+            return set()
+        timetable = timetable or self._current()
+        return {key for key in timetable.stations if needle in key}
+
+    def search(self, origin, destination, k=3):
+        """Returns up to `k` journeys as lists of (leg, departs, arrives), fastest first."""
+        timetable = self._current()
+        origins = self.resolve(origin, timetable)
+        destinations = self.resolve(destination, timetable) - origins
+        if not origins or not destinations:
+            return []
+
+        profiles = self._profiles(timetable, destinations)
+
+        candidates = []
+        for origin_key in origins:
+            for _, entries in profiles.get(origin_key, ()):
+                for departs, arrives, legs, step in entries:
+                    if departs < MINUTES_PER_DAY and arrives - departs <= self.horizon:
+                        candidates.append((arrives - departs, legs, departs, step))
+        candidates.sort(key=lambda c: c[:3])
+
+        journeys = []
+        for _, _, _, step in candidates[:k]:
+            journey = []
+            while step is not None:
+                leg, departs, arrives, step = step
+                journey.append((leg, departs, arrives))
+            journeys.append(journey)
+        return journeys
+
+    def _profiles(self, timetable, destinations):
+        """
+        One backward scan over the connections. Every station gets one
+        profile per number of legs (index 0 is a single train), each holding
+        (departure, arrival at a destination) journeys newest departure first,
+        so the best onward journey after a given arrival is a binary search
+        away. A journey is only added if no journey with as many or fewer
+        legs leaves later and arrives no later.
+        """
+        profiles = {}
+        connections = timetable.connections
+        legs = timetable.legs
+
+        # Nothing departing after the last possible arrival can be part of a journey.
+        cutoff = bisect.bisect_right(connections, (MINUTES_PER_DAY + self.horizon + 1,))
+        for position in range(cutoff - 1, -1, -1):
+            departs, arrives, train_id = connections[position]
+            leg = legs[train_id]
+            direct = leg.destination in destinations
+            onward_profiles = None if direct else profiles.get(leg.destination)
+            if not direct and onward_profiles is None:
+                continue
+
+            profile = profiles.get(leg.origin)
+            if profile is None:
+                profile = profiles[leg.origin] = [([], []) for _ in range(self.max_legs)]
+            ready = arrives + self.min_transfer
+            best = None
+            for count in range(1, 2 if direct else self.max_legs + 1):
+                keys, entries = profile[count - 1]
+                if entries and (best is None or entries[-1][1] < best):
+                    best = entries[-1][1]
+                if direct:
+                    reached, onward = arrives, None
+                else:
+                    if count == 1:
+                        continue
+                    onward_keys, onward_entries = onward_profiles[count - 2]
+                    index = bisect.bisect_right(onward_keys, -ready) - 1
+                    if index < 0:
+                        continue
+                    _, reached, _, onward = onward_entries[index]
+                if best is not None and best <= reached:
+                    continue
+                keys.append(-departs)
+                entries.append((departs, reached, count, (leg, departs, arrives, onward)))
+                best = reached
+
+        return profiles
+
+
+def describe(journey):
+    """JSON-friendly view of one journey for the model."""
+    legs = []
+    for index, (leg, departs, arrives) in enumerate(journey):
+        entry = dict(leg.train)
+        entry["departure"] = format_clock(departs)
+        entry["arrival"] = format_clock(arrives)
+        if index:
+            entry["wait_before"] = format_duration(departs - journey[index - 1][2])
+        legs.append(entry)
+
+    departs, arrives = journey[0][1], journey[-1][2]
+    return {
+        "legs": legs,
+        "changes": [leg.train["start"] for leg, _, _ in journey[1:]],
+        "departure": format_clock(departs),
+        "arrival": format_clock(arrives),
+        "duration": format_duration(arrives - departs),
+        "total_price": round(sum(leg.train["price"] or 0 for leg, _, _ in journey), 2),
+        "min_seats": min(leg.train["seats"] for leg, _, _ in journey),
+    }
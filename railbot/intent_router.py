@@ -0,0 +1,141 @@
+"""
+Rule-based pre-router that answers unambiguous messages without Gemini.
+
+Route queries such as "trains from Chennai to CBE" are matched against
+the station names in the trains table, and "I selected <train>" messages
+sent by the train cards are matched against the selected train. Anything
+that is not fully explained by station names and a small set of filler
+words falls back to the model.
+"""
+import re
+import time
+import threading
+from collections import namedtuple
+
+Intent = namedtuple("Intent", ["name", "args"])
+
+STATION_INDEX_TTL = 300
+
+FILLER_WORDS = {
+    "a", "all", "am", "an", "and", "any", "are", "available", "between", "can",
+    "check", "find", "for", "from", "get", "go", "going", "hi", "hello", "i",
+    "is", "list", "looking", "me", "my", "need", "of", "please", "pls", "route",
+    "search", "see", "show", "some", "the", "there", "ticket", "tickets", "to",
+    "train", "trains", "travel", "travelling", "traveling", "want", "what",
+    "which", "would", "like", "you", "options",
+}
+
+POLICY_KEYWORDS = {
+    "refund", "refunds", "cancel", "cancels", "cancellation", "cancellations",
+    "cancelled", "canceled", "luggage", "baggage", "bag", "bags", "tatkal",
+    "waitlist", "waitlisted", "wl", "rac", "concession", "concessions",
+    "complaint", "complaints", "helpline", "delay", "delayed", "delays",
+    "compensation", "berth", "berths", "policy", "policies", "rule", "rules",
+    "allowed", "allowance", "fee", "fees", "charges", "penalty", "senior",
+    "pet", "pets", "lost", "tdr", "chart", "reservation",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|->|→")
+_SELECTION_RE = re.compile(r"^\s*i\s+selected\s+(.+?)\s*$", re.IGNORECASE)
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class StationIndex:
+    """
+    Station names from the trains table, tokenised for phrase matching.
+    Rebuilt lazily after `invalidate()` or once the TTL has passed.
+    """
+
+    def __init__(self, loader, ttl=STATION_INDEX_TTL):
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._phrases = {}
+        self._max_len = 0
+        self._loaded_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl:
+                return
+            phrases = {}
+            for name in self._loader():
+                key = tuple(_tokens(name))
+                if key:
+                    phrases.setdefault(key, set()).add(name)
+            self._phrases = phrases
+            self._max_len = max((len(k) for k in phrases), default=0)
+            self._loaded_at = time.monotonic()
+
+    def match(self, tokens, start):
+        """Returns (station_name, length) for the longest station at tokens[start:], or None."""
+        self._ensure_loaded()
+        for length in range(min(self._max_len, len(tokens) - start), 0, -1):
+            names = self._phrases.get(tuple(tokens[start:start + length]))
+            if names:
+                if len(names) > 1:
+                    return None
+                return next(iter(names)), length
+        return None
+
+
+def detect_route(message, index):
+    """
+    Returns Intent("search_trains", ...) when the message names exactly two
+    known stations, their direction is clear and every other word is filler.
+    """
+    tokens = _tokens(message)
+    if not tokens or len(tokens) > 20:
+        return None
+
+    stations = []
+    after_to = []
+    i = 0
+    while i < len(tokens):
+        found = index.match(tokens, i)
+        if found:
+            name, length = found
+            previous = tokens[i - 1] if i else None
+            stations.append(name)
+            after_to.append(previous in ("to", "->", "→"))
+            i += length
+            continue
+        if tokens[i] not in FILLER_WORDS and tokens[i] not in ("->", "→"):
+            return None
+        i += 1
+
+    if len(stations) != 2 or stations[0] == stations[1]:
+        return None
+
+    if after_to == [False, True]:
+        start, end = stations
+    elif after_to == [True, False] and "from" in tokens:
+        end, start = stations
+    elif after_to == [False, False] and "between" in tokens and "and" in tokens:
+        start, end = stations
+    else:
+        return None
+
+    return Intent("search_trains", {"start_station": start, "end_station": end})
+
+
+def detect_selection(message, train_id, train_name):
+    """Matches the "I selected <train name>" message the train cards send."""
+    if not train_id or not train_name:
+        return None
+    match = _SELECTION_RE.match(message or "")
+    if not match or match.group(1).strip().lower() != train_name.strip().lower():
+        return None
+    return Intent("select_train", {"train_id": train_id, "name": train_name})
+
+
+def looks_like_policy_question(message):
+    """Cheap lexical check used to start guideline retrieval speculatively."""
+    return any(token in POLICY_KEYWORDS for token in _tokens(message))
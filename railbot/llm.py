@@ -0,0 +1,410 @@
+"""
+Resilient wrapper around the genai client.
+
+ResilientClient exposes the same `chats.create(...)` and
+`models.embed_content(...)` calls the app already uses, and adds:
+
+- first-token and idle deadlines on chat streams,
+- jittered retries and optional hedged requests for embeddings,
+- a circuit breaker per model, and
+- fallback to a cheaper model (LLM_FALLBACK_MODEL) when the primary
+  model times out, errors before its first chunk, or has its circuit open.
+
+Every decision is counted in railbot_llm_calls_total. The shared client
+is created on first use by get_client(), so importing the app does not
+load google-genai or need GEMINI_API_KEY.
+"""
+import os
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import metrics
+
+PRIMARY_MODEL = os.getenv("LLM_PRIMARY_MODEL", "gemini-2.5-flash")
+FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gemini-2.5-flash-lite")
+HTTP_TIMEOUT_MS = int(os.getenv("LLM_HTTP_TIMEOUT_MS", "30000"))
+FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "15"))
+STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "30"))
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+EMBED_RETRIES = int(os.getenv("EMBED_RETRIES", "2"))
+EMBED_HEDGE_AFTER_MS = float(os.getenv("EMBED_HEDGE_AFTER_MS", "0"))
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+_client = None
+_client_lock = threading.Lock()
+
+LLM_CALLS = metrics.Counter(
+    "railbot_llm_calls_total",
+    "Gemini calls and resilience decisions by operation, model and outcome.",
+    labelnames=("operation", "model", "outcome"))
+
+LLM_SECONDS = metrics.Histogram(
+    "railbot_llm_call_seconds",
+    "Gemini call latency (time to first chunk for chat streams).",
+    labelnames=("operation", "model"))
+
+BREAKER_TRANSITIONS = metrics.Counter(
+    "railbot_llm_circuit_transitions_total",
+    "Circuit breaker state changes per model.",
+    labelnames=("model", "state"))
+
+
+class LLMTimeoutError(TimeoutError):
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class TurnDeadlineExceeded(TimeoutError):
+    """The caller's overall deadline passed; not a failure of the model."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures, rejects calls for `cooldown`
+    seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            BREAKER_TRANSITIONS.inc(self.name, state)
+            print(f"[LLM] Circuit for {self.name} is now {state}")
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self._set_state("half_open")
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._set_state("closed")
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == "half_open" or self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release_trial(self):
+        """
+        Ends a half-open trial that finished without a verdict (the turn
+        deadline passed or the caller stopped reading): the circuit opens
+        again for another cooldown instead of staying half-open for good.
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+
+def _pump(make_stream, q, stop):
+    try:
+        stream = make_stream()
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                q.put(("chunk", chunk))
+        finally:
+            close = getattr(stream, "close", None)
+            if stop.is_set() and close is not None:
+                close()
+        q.put(("end", None))
+    except BaseException as e:
+        q.put(("error", e))
+
+
+def iter_with_deadlines(make_stream, first_timeout, idle_timeout, deadline=None, on_abandon=None):
+    """
+    Iterates a blocking stream on a helper thread so the caller can give up
+    when the first chunk, or any later chunk, takes too long, or when the
+    absolute `deadline` (time.monotonic()) passes.
+
+    A stream given up on keeps its helper thread until the next chunk
+    arrives; the thread then stops reading and `on_abandon()` is called
+    straight away so the caller can count it.
+    """
+    q = queue.Queue()
+    stop = threading.Event()
+    threading.Thread(target=_pump, args=(make_stream, q, stop), daemon=True).start()
+
+    first = True
+    finished = False
+    try:
+        while True:
+            timeout = first_timeout if first else idle_timeout
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TurnDeadlineExceeded("Turn deadline passed")
+            try:
+                kind, value = q.get(timeout=min(timeout, remaining) if remaining is not None else timeout)
+            except queue.Empty:
+                if remaining is not None and remaining <= timeout:
+                    raise TurnDeadlineExceeded("Turn deadline passed")
+                stage = "first token" if first else "next chunk"
+                raise LLMTimeoutError(f"Timed out waiting for {stage}")
+            if kind == "end":
+                finished = True
+                return
+            if kind == "error":
+                finished = True
+                raise value
+            first = False
+            yield value
+    finally:
+        if not finished:
+            stop.set()
+            if on_abandon is not None:
+                on_abandon()
+
+
+class ResilientChat:
+    def __init__(self, owner, model, history, config):
+        self._owner = owner
+        self.model = model
+        self._history = list(history or [])
+        self._config = config
+        self._chat = None
+        self._turns = 0
+
+    def _ensure_chat(self, model):
+        if self._chat is None or model != self.model:
+            history = self._history if self._chat is None else self._switch_history()
+            with metrics.span("chat_create"):
+                self._chat = self._owner.client.chats.create(
+                    model=model, history=history, config=self._config)
+            self.model = model
+        return self._chat
+
+    def _switch_history(self):
+        if self._turns == 0:
+            return self._history
+        return self._chat.get_history(curated=True)
+
+    def _candidates(self):
+        fallback = self._owner.fallbacks.get(self.model)
+        can_switch = self._turns == 0 or hasattr(self._chat, "get_history")
+        return [self.model] + ([fallback] if fallback and can_switch else [])
+
+    def send_message_stream(self, message, deadline=None):
+        candidates = self._candidates()
+
+        for index, model in enumerate(candidates):
+            is_last = index == len(candidates) - 1
+            breaker = self._owner.breaker(model)
+
+            if not breaker.allow():
+                LLM_CALLS.inc("chat", model, "circuit_open")
+                if not is_last:
+                    LLM_CALLS.inc("chat", model, "fallback")
+                    continue
+                raise CircuitOpenError(f"{model} is unavailable")
+
+            chat = self._ensure_chat(model)
+            started = time.perf_counter()
+            delivered = False
+            settled = False
+            try:
+                for chunk in iter_with_deadlines(
+                        lambda: chat.send_message_stream(message),
+                        self._owner.first_token_timeout, self._owner.idle_timeout, deadline,
+                        on_abandon=lambda: LLM_CALLS.inc("chat", model, "abandoned")):
+                    if not delivered:
+                        LLM_SECONDS.observe(time.perf_counter() - started, "chat", model)
+                        delivered = True
+                    yield chunk
+            except TurnDeadlineExceeded:
+                LLM_CALLS.inc("chat", model, "deadline")
+                raise
+            except Exception as e:
+                breaker.failure()
+                settled = True
+                outcome = "timeout" if isinstance(e, LLMTimeoutError) else "error"
+                LLM_CALLS.inc("chat", model, outcome)
+                if delivered or is_last:
+                    raise
+                print(f"[LLM] {model} failed before first token ({e}), falling back")
+                LLM_CALLS.inc("chat", model, "fallback")
+                continue
+            else:
+                breaker.success()
+                settled = True
+            finally:
+                if not settled:
+                    breaker.release_trial()
+
+            LLM_CALLS.inc("chat", model, "success")
+            self._turns += 1
+            return
+
+    def get_history(self, *args, **kwargs):
+        return self._chat.get_history(*args, **kwargs) if self._chat else self._history
+
+
+class _Chats:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model, history=None, config=None):
+        return ResilientChat(self._owner, model, history, config)
+
+
+class _Models:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def embed_content(self, model, contents, config=None):
+        return self._owner.embed(model, contents, config)
+
+
+class ResilientClient:
+    def __init__(self, client, fallbacks=None,
+                 first_token_timeout=FIRST_TOKEN_TIMEOUT, idle_timeout=STREAM_IDLE_TIMEOUT,
+                 embed_timeout=EMBED_TIMEOUT, embed_retries=EMBED_RETRIES,
+                 hedge_after_ms=EMBED_HEDGE_AFTER_MS):
+        self.client = client
+        if fallbacks is None:
+            fallbacks = {PRIMARY_MODEL: FALLBACK_MODEL} if FALLBACK_MODEL else {}
+        self.fallbacks = fallbacks
+        self.first_token_timeout = first_token_timeout
+        self.idle_timeout = idle_timeout
+        self.embed_timeout = embed_timeout
+        self.embed_retries = embed_retries
+        self.hedge_after = hedge_after_ms / 1000
+        self.chats = _Chats(self)
+        self.models = _Models(self)
+        self._breakers = {}
+        self._lock = threading.Lock()
+        # A timed-out call keeps its worker until the HTTP call returns, so
+        # leave room for every retry and hedge of 8 concurrent embeddings.
+        workers = 8 * (embed_retries + 1) * (2 if self.hedge_after else 1)
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv("EMBED_WORKERS", workers)),
+                                            thread_name_prefix="embed")
+
+    def breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(model)
+            return self._breakers[model]
+
+    def _embed_once(self, model, contents, config):
+        """
+        One embedding attempt, hedged with a duplicate request if it is slow.
+
+        The timeout runs from when a worker starts the call, not from submit,
+        so time queued behind abandoned calls is not charged to this one; the
+        wait for a free worker is bounded by another embed_timeout.
+        """
+        started = []
+
+        def call():
+            started.append(time.monotonic())
+            return self.client.models.embed_content(model=model, contents=contents, config=config)
+
+        pending = {self._executor.submit(call): "primary"}
+        submitted = time.monotonic()
+        hedged = False
+
+        if self.hedge_after and self.hedge_after < self.embed_timeout:
+            done, _ = wait(pending, timeout=self.hedge_after)
+            if not done:
+                LLM_CALLS.inc("embed", model, "hedge")
+                pending[self._executor.submit(call)] = "hedge"
+                hedged = True
+
+        error = None
+        while pending:
+            remaining = (started[0] if started else submitted) + self.embed_timeout - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                role = pending.pop(future)
+                if future.exception() is None:
+                    if hedged:
+                        LLM_CALLS.inc("embed", model, f"{role}_won")
+                    self._abandon(model, pending)
+                    return future.result()
+                error = future.exception()
+
+        if not pending and error is not None:
+            raise error
+        self._abandon(model, pending)
+        raise LLMTimeoutError(f"Embedding timed out after {self.embed_timeout}s")
+
+    def _abandon(self, model, futures):
+        """Cancels calls still queued; ones already running are left to finish and counted."""
+        for future in futures:
+            if not future.cancel() and not future.done():
+                LLM_CALLS.inc("embed", model, "abandoned")
+
+    def embed(self, model, contents, config=None):
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            LLM_CALLS.inc("embed", model, "circuit_open")
+            raise CircuitOpenError(f"{model} is unavailable")
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self._embed_once(model, contents, config)
+            except Exception as e:
+                breaker.failure()
+                outcome = "timeout" if isinstance(e, LLMTimeoutError) else "error"
+                LLM_CALLS.inc("embed", model, outcome)
+                if attempt >= self.embed_retries or not breaker.allow():
+                    raise
+                attempt += 1
+                LLM_CALLS.inc("embed", model, "retry")
+                time.sleep(random.uniform(0, 0.2 * 2 ** attempt))
+                continue
+
+            LLM_SECONDS.observe(time.perf_counter() - started, "embed", model)
+            breaker.success()
+            LLM_CALLS.inc("embed", model, "success")
+            return response
+
+
+def get_client():
+    """Returns the process-wide ResilientClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+                from google.genai import types
+
+                _client = ResilientClient(genai.Client(
+                    api_key=os.getenv("GEMINI_API_KEY"),
+                    http_options=types.HttpOptions(timeout=HTTP_TIMEOUT_MS)))
+    return _client
+
+
+def set_client(client):
+    """Replaces the shared client, e.g. with a ResilientClient around a fake."""
+    global _client
+    with _client_lock:
+        _client = client
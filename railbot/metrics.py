@@ -0,0 +1,280 @@
+"""
+Lightweight latency instrumentation.
+
+`span("stage")` times a block, feeds a Prometheus histogram and adds the
+duration to the current request trace. Non-streaming responses get a
+`Server-Timing` header built from the trace, `/metrics` serves all
+histograms and counters in Prometheus text format, and requests slower
+than SLOW_REQUEST_MS are logged with a per-stage breakdown.
+"""
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+_registry = []
+_local = threading.local()
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+               for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for labels, (counts, total, count) in items:
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket"
+                                 f"{_format_labels(self.labelnames, labels, ('le', repr(float(bound))))}"
+                                 f" {cumulative}")
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labelnames, labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram(
+    "railbot_stage_duration_seconds",
+    "Time spent in each stage of a request.",
+    labelnames=("stage",))
+
+REQUEST_SECONDS = Histogram(
+    "railbot_request_duration_seconds",
+    "End-to-end request time, including the full stream for SSE routes.",
+    labelnames=("endpoint", "method", "status"))
+
+SLOW_REQUESTS = Counter(
+    "railbot_slow_requests_total",
+    "Requests slower than SLOW_REQUEST_MS.",
+    labelnames=("endpoint",))
+
+
+class RequestTrace:
+    """Per-request record of how long each stage took."""
+
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.status = None
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.finished = False
+
+    def add(self, stage, seconds):
+        total, count = self.stages.get(stage, (0.0, 0))
+        self.stages[stage] = (total + seconds, count + 1)
+
+    def server_timing(self):
+        entries = []
+        for stage, (seconds, _) in self.stages.items():
+            token = stage.replace(".", "-").replace(" ", "-")
+            entries.append(f"{token};dur={seconds * 1000:.1f}")
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def breakdown(self):
+        return ", ".join(f"{stage}={seconds * 1000:.0f}ms" + (f" x{count}" if count > 1 else "")
+                         for stage, (seconds, count) in self.stages.items())
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def use_trace(trace):
+    """Makes `trace` current for the enclosed block (e.g. inside an SSE generator)."""
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def record(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage)
+    trace = current_trace()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def timed(stage):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_stream(stream, first_stage, total_stage):
+    """
+    Wraps a model stream, recording time to the first chunk under
+    `first_stage` and time until exhaustion under `total_stage`.
+    """
+    started = time.perf_counter()
+    first = True
+    try:
+        for item in stream:
+            if first:
+                record(first_stage, time.perf_counter() - started)
+                first = False
+            yield item
+    finally:
+        record(total_stage, time.perf_counter() - started)
+
+
+def finish_trace(trace):
+    if trace is None or trace.finished:
+        return
+    trace.finished = True
+    elapsed = time.perf_counter() - trace.started
+    REQUEST_SECONDS.observe(elapsed, trace.endpoint, trace.method, str(trace.status))
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        SLOW_REQUESTS.inc(trace.endpoint)
+        print(f"[Slow Request] {trace.method} {trace.endpoint} {elapsed * 1000:.0f}ms "
+              f"status={trace.status} stages: {trace.breakdown() or 'none'}")
+
+
+def render_prometheus():
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+def init_app(app):
+    @app.before_request
+    def _start_trace():
+        _local.trace = RequestTrace(request.endpoint or request.path, request.method)
+
+    @app.after_request
+    def _server_timing(response):
+        trace = current_trace()
+        if trace is None:
+            return response
+        trace.status = response.status_code
+
+        if response.mimetype == "text/event-stream":
+            # The stream finishes the trace itself once the last event is sent.
+            return response
+
+        response.headers["Server-Timing"] = trace.server_timing()
+        finish_trace(trace)
+        return response
+
+    @app.teardown_request
+    def _clear_trace(exc):
+        trace = current_trace()
+        if trace is not None and not trace.finished and exc is not None:
+            trace.status = 500
+            finish_trace(trace)
+        _local.trace = None
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,131 @@
+"""
+Post-retrieval processing for guideline chunks.
+
+The PDF is split into 500-character chunks every 400 characters, so the
+nearest chunks for a question often share 100 characters or more. Before
+anything reaches the prompt, candidates are:
+
+1. reranked on CPU by fusing the embedding rank with a keyword-overlap rank,
+2. picked in that order while they fit the character budget, with chunks
+   that are adjacent in the PDF merged into one passage (the shared text
+   is kept once), and
+3. skipped when a near-duplicate of an already-picked passage.
+"""
+import re
+from collections import namedtuple
+
+Passage = namedtuple("Passage", ["source", "start", "end", "text", "score"])
+
+RRF_K = 60
+DUPLICATE_THRESHOLD = 0.8
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)")
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or",
+    "the", "this", "to", "what", "when", "where", "which", "who", "will", "with",
+    "you", "your",
+}
+
+
+def _words(text):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _shingles(text, size=3):
+    words = _words(text)
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def similarity(a, b):
+    """Jaccard similarity of word trigrams."""
+    sa, sb = _shingles(a), _shingles(b)
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def rerank(query, candidates, chunk_size):
+    """
+    Orders (text, metadata, embedding_rank) candidates by reciprocal-rank
+    fusion of the embedding rank and the share of query keywords they contain.
+    Returns Passages, best first; `end` is where the chunk ends in the PDF text.
+    """
+    terms = {w for w in _words(query) if w not in STOP_WORDS}
+    lexical = []
+    for text, _, _ in candidates:
+        words = set(_words(text))
+        lexical.append(len(terms & words) / len(terms) if terms else 0.0)
+    lexical_rank = {i: r for r, i in enumerate(sorted(range(len(candidates)),
+                                                      key=lambda i: -lexical[i]))}
+
+    passages = []
+    for i, (text, metadata, rank) in enumerate(candidates):
+        metadata = metadata or {}
+        start = metadata.get("chunk_index", -1)
+        score = 1 / (RRF_K + rank) + 1 / (RRF_K + lexical_rank[i])
+        passages.append(Passage(metadata.get("source"), start, start + chunk_size, text, score))
+    passages.sort(key=lambda p: -p.score)
+    return passages
+
+
+def _join(first, second):
+    """Concatenates two consecutive chunks, keeping their shared text once."""
+    probe = second.text[:40]
+    overlap = first.end - second.start
+    position = first.text.find(probe, max(0, len(first.text) - overlap - len(probe)))
+    text = first.text[:position] + second.text if position >= 0 else f"{first.text} {second.text}"
+    return Passage(first.source, first.start, max(first.end, second.end), text,
+                   max(first.score, second.score))
+
+
+def merge_adjacent(passages):
+    """Merges passages from the same source whose chunks touch or overlap."""
+    ordered = sorted(passages, key=lambda p: (str(p.source), p.start))
+    merged = []
+    for passage in ordered:
+        last = merged[-1] if merged else None
+        if (last is not None and passage.start >= 0 and last.source == passage.source
+                and passage.start <= last.end):
+            merged[-1] = _join(last, passage)
+        else:
+            merged.append(passage)
+    return merged
+
+
+def _truncate(text, limit):
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(cut)]
+    return cut[:ends[-1]] if ends and ends[-1] > limit // 2 else cut.rstrip() + "…"
+
+
+def pack(passages, budget, max_passages):
+    """
+    Greedily selects passages (best first) into at most `budget` characters
+    once merged, dropping near-duplicates. Returns the merged passages in
+    score order.
+    """
+    separator = 2
+    chosen = []
+    selected = []
+    for passage in passages:
+        if len(chosen) >= max_passages:
+            break
+        if any(similarity(passage.text, p.text) >= DUPLICATE_THRESHOLD for p in chosen):
+            continue
+        trial = merge_adjacent(chosen + [passage])
+        size = sum(len(p.text) for p in trial) + separator * (len(trial) - 1)
+        if size > budget:
+            continue
+        chosen.append(passage)
+        selected = trial
+
+    if not selected and passages:
+        best = passages[0]
+        selected = [best._replace(text=_truncate(best.text, budget))]
+
+    return sorted(selected, key=lambda p: -p.score)
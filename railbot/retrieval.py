@@ -0,0 +1,195 @@
+"""
+Guideline retrieval over the railway policy PDF.
+
+The ChromaDB collection is opened by get_collection() on first use, and an
+empty collection is filled from GUIDELINES_PDF at that point, so importing
+the app touches neither the disk nor Gemini. Run `flask --app app
+load-guidelines` to do the load ahead of the first policy question.
+
+retrieve_guidelines fetches RAG_CANDIDATES chunks, reranks them, merges
+overlapping neighbours and packs the result into RAG_CONTEXT_CHARS
+characters (about a quarter as many tokens); see passages.py.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics, intent_router, llm, passages
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+GUIDELINES_PDF = os.getenv("GUIDELINES_PDF", "railway_guidelines.pdf")
+COLLECTION_NAME = "railway_guidelines"
+EMBEDDING_MODEL = "gemini-embedding-001"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "8"))
+RAG_CONTEXT_CHARS = int(os.getenv("RAG_CONTEXT_CHARS", "1200"))
+
+RAG_CONTEXT_SIZE = metrics.Histogram(
+    "railbot_rag_context_chars",
+    "Characters of guideline context sent to the model per retrieval.",
+    buckets=(0, 250, 500, 750, 1000, 1250, 1500, 2000, 3000))
+
+_collection = None
+_collection_lock = threading.Lock()
+
+
+def get_collection():
+    """Returns the guidelines collection, opening (and seeding) it on first use."""
+    global _collection
+    if _collection is None:
+        with _collection_lock:
+            if _collection is None:
+                import chromadb
+                from chromadb.config import Settings
+
+                chroma_client = chromadb.PersistentClient(
+                    path=CHROMA_PATH,
+                    settings=Settings(anonymized_telemetry=False)
+                )
+                collection = chroma_client.get_or_create_collection(name=COLLECTION_NAME)
+                print("ChromaDB collection count:", collection.count())
+
+                if collection.count() == 0:
+                    if os.path.exists(GUIDELINES_PDF):
+                        pdf_to_chroma(GUIDELINES_PDF, collection)
+                    else:
+                        print(f"Warning: {GUIDELINES_PDF} not found. RAG disabled.")
+                else:
+                    print("ChromaDB already has data, skipping PDF load.")
+                _collection = collection
+    return _collection
+
+
+def pdf_to_chroma(pdf_path: str, collection=None):
+    """Load PDF into ChromaDB using Gemini embeddings with overlap chunking."""
+    import PyPDF2
+
+    collection = collection if collection is not None else get_collection()
+    print(f"Reading PDF: {pdf_path}")
+
+    with open(pdf_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        page_texts = [page.extract_text() or "" for page in pdf_reader.pages]
+        full_text = " ".join(page_texts)
+
+    chunks = []
+    metadatas = []
+    ids = []
+
+    for i in range(0, len(full_text), CHUNK_SIZE - CHUNK_OVERLAP):
+        chunk = full_text[i:i + CHUNK_SIZE].strip()
+        if chunk:
+            chunks.append(chunk)
+            metadatas.append({"source": pdf_path, "chunk_index": i})
+            ids.append(f"chunk_{i}")
+
+    print(f"Generating Gemini embeddings for {len(chunks)} chunks...")
+
+    client = llm.get_client()
+    embeddings = []
+    for chunk in chunks:
+        response = client.models.embed_content(
+            model=EMBEDDING_MODEL,
+            contents=chunk
+        )
+        embeddings.append(response.embeddings[0].values)
+
+    print("Storing in ChromaDB...")
+    collection.upsert(
+        documents=chunks,
+        embeddings=embeddings,
+        metadatas=metadatas,
+        ids=ids
+    )
+    print(f"Loaded {len(chunks)} chunks into ChromaDB with Gemini embeddings.")
+
+
+@metrics.timed("tool.retrieve_guidelines")
+def retrieve_guidelines(query: str, n_results: int = 3) -> str:
+    """
+    Retrieve relevant railway policy/guideline chunks using Gemini embeddings.
+    Called by the model as a tool when it decides a policy question needs answering.
+    """
+    collection = get_collection()
+    if collection.count() == 0:
+        return "No guidelines available."
+
+    try:
+        with metrics.span("rag.embedding"):
+            response = llm.get_client().models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=query
+            )
+    except Exception as e:
+        print(f"[RAG Tool] Embedding failed for query '{query}': {e}")
+        return "The railway guidelines are temporarily unavailable. Please try again shortly."
+    query_embedding = response.embeddings[0].values
+
+    with metrics.span("rag.chroma_query"):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(max(n_results, RAG_CANDIDATES), collection.count()),
+            include=["documents", "metadatas"]
+        )
+
+    docs = results.get("documents", [[]])[0]
+    metadatas = (results.get("metadatas") or [[]])[0] or [None] * len(docs)
+
+    with metrics.span("rag.pack"):
+        candidates = [(doc, metadata, rank)
+                      for rank, (doc, metadata) in enumerate(zip(docs, metadatas))]
+        packed = passages.pack(passages.rerank(query, candidates, CHUNK_SIZE),
+                               RAG_CONTEXT_CHARS, n_results)
+    context = "\n\n".join(p.text for p in packed)
+    RAG_CONTEXT_SIZE.observe(len(context))
+    print(f"[RAG Tool] Packed {len(packed)} passages from {len(docs)} candidates into {len(context)} chars for query: '{query}'")
+    return context if context else "No relevant guidelines found for this query."
+
+
+GUIDELINE_PREFETCH_TOTAL = metrics.Counter(
+    "railbot_guideline_prefetch_total",
+    "Speculative guideline retrievals by outcome (hit, miss, error, unused).",
+    labelnames=("outcome",))
+
+prefetch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PREFETCH_WORKERS", "4")),
+    thread_name_prefix="rag-prefetch")
+
+
+class GuidelinePrefetch:
+    """
+    Starts retrieve_guidelines on a background thread when the user's message
+    looks like a policy question, so the embedding and Chroma query overlap
+    with the first model call. The system prompt tells the model to pass the
+    user's question as the query, so the prefetched context answers the
+    first retrieve_guidelines call of the turn.
+    """
+
+    def __init__(self, message):
+        self.future = None
+        if message and intent_router.looks_like_policy_question(message):
+            self.future = prefetch_executor.submit(retrieve_guidelines, message)
+
+    def take(self, query):
+        if self.future is None:
+            GUIDELINE_PREFETCH_TOTAL.inc("miss")
+            return retrieve_guidelines(query)
+
+        future, self.future = self.future, None
+        try:
+            with metrics.span("rag.prefetch_wait"):
+                context = future.result()
+        except Exception as e:
+            print(f"[RAG Prefetch] Failed, retrying inline: {e}")
+            GUIDELINE_PREFETCH_TOTAL.inc("error")
+            return retrieve_guidelines(query)
+
+        GUIDELINE_PREFETCH_TOTAL.inc("hit")
+        return context
+
+    def discard(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+            GUIDELINE_PREFETCH_TOTAL.inc("unused")
@@ -0,0 +1,94 @@
+"""
+Read-through cache for route searches.
+
+Results are keyed by the normalised (start, end) pair, expire after
+ROUTE_CACHE_TTL seconds and are evicted least-recently-used beyond
+ROUTE_CACHE_SIZE entries. Successful bookings patch the cached seat
+counts in place, and catalog edits clear the cache, so popular routes are
+served from memory without showing stale availability. Other workers'
+bookings are only picked up once the TTL expires.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from . import metrics
+
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", "30"))
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "512"))
+
+ROUTE_CACHE_TOTAL = metrics.Counter(
+    "railbot_route_cache_total",
+    "Route search cache lookups by outcome (hit, miss, expired).",
+    labelnames=("outcome",))
+
+
+def normalize_station(name):
+    return " ".join((name or "").split())
+
+
+def route_key(start_station, end_station):
+    return (normalize_station(start_station).casefold(),
+            normalize_station(end_station).casefold())
+
+
+def _copy_result(result):
+    copied = dict(result)
+    if "trains" in copied:
+        copied["trains"] = [dict(train) for train in copied["trains"]]
+    return copied
+
+
+class RouteCache:
+    def __init__(self, ttl=ROUTE_CACHE_TTL, max_entries=ROUTE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every write, so a load that raced a booking is not stored.
+        self._generation = 0
+
+    def get_or_load(self, start_station, end_station, loader):
+        """
+        Returns a copy of the cached result for the route, calling
+        `loader()` on a miss. A ttl or size of 0 disables caching.
+        """
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return loader()
+
+        key = route_key(start_station, end_station)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                ROUTE_CACHE_TOTAL.inc("hit")
+                return _copy_result(entry[1])
+            generation = self._generation
+
+        ROUTE_CACHE_TOTAL.inc("expired" if entry is not None else "miss")
+        result = loader()
+
+        with self._lock:
+            if generation != self._generation:
+                return result
+            self._entries[key] = (now, _copy_result(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def update_seats(self, train_id, seats):
+        """Patches the seat count of `train_id` in every cached result."""
+        with self._lock:
+            self._generation += 1
+            for _, result in self._entries.values():
+                for train in result.get("trains", ()):
+                    if train["train_id"] == train_id:
+                        train["seats"] = seats
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
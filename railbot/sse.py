@@ -0,0 +1,173 @@
+"""
+Server-sent event writer for /chat/stream.
+
+Events are produced on a background thread into a per-stream EventBuffer
+and read by the HTTP response generator. The buffer:
+
+- coalesces consecutive text deltas for up to SSE_COALESCE_MS or
+  SSE_COALESCE_CHARS before emitting one frame,
+- numbers every frame with `id: <stream_id>:<seq>`,
+- lets readers send `: heartbeat` comments while nothing new arrives, and
+- is kept for SSE_REPLAY_TTL seconds after the stream finishes, so a client
+  reconnecting with Last-Event-ID picks up where it left off without the
+  model being run again.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+
+COALESCE_SECONDS = float(os.getenv("SSE_COALESCE_MS", "40")) / 1000
+COALESCE_CHARS = int(os.getenv("SSE_COALESCE_CHARS", "256"))
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "10"))
+REPLAY_TTL = float(os.getenv("SSE_REPLAY_TTL", "120"))
+MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "1000"))
+
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+
+def format_event(event_id, event_type, content=None):
+    payload = {"type": event_type}
+    if content is not None:
+        payload["content"] = content
+    return f"id: {event_id}\ndata: {json.dumps(payload)}\n\n"
+
+
+class EventBuffer:
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.frames = []
+        self.done = False
+        self.finished_at = None
+        self._cond = threading.Condition()
+        self._pending_text = ""
+        self._pending_since = None
+
+    def _append(self, event_type, content=None):
+        event_id = f"{self.stream_id}:{len(self.frames) + 1}"
+        self.frames.append(format_event(event_id, event_type, content))
+        self._cond.notify_all()
+
+    def _flush_text(self):
+        if self._pending_text:
+            self._append("text", self._pending_text)
+            self._pending_text = ""
+            self._pending_since = None
+
+    def push(self, event_type, content=None):
+        with self._cond:
+            if event_type == "text":
+                if not self._pending_text:
+                    self._pending_since = time.monotonic()
+                self._pending_text += content
+                if (len(self._pending_text) >= COALESCE_CHARS
+                        or time.monotonic() - self._pending_since >= COALESCE_SECONDS):
+                    self._flush_text()
+                return
+
+            self._flush_text()
+            self._append(event_type, content)
+
+    def close(self):
+        with self._cond:
+            self._flush_text()
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    def read(self, after=0):
+        """Yields frames after sequence number `after`, with heartbeats while idle."""
+        position = after
+        last_sent = time.monotonic()
+
+        if after == 0:
+            # An id-only frame lets the client resume even before the first event.
+            yield f"id: {self.stream_id}:0\n\n"
+
+        while True:
+            with self._cond:
+                while position >= len(self.frames) and not self.done:
+                    if self._pending_text:
+                        age = time.monotonic() - self._pending_since
+                        if age >= COALESCE_SECONDS:
+                            self._flush_text()
+                            break
+                        timeout = COALESCE_SECONDS - age
+                    else:
+                        timeout = HEARTBEAT_SECONDS - (time.monotonic() - last_sent)
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+
+                frames = self.frames[position:]
+                finished = self.done
+
+            if frames:
+                position += len(frames)
+                last_sent = time.monotonic()
+                yield "".join(frames)
+            elif finished:
+                return
+            elif time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield HEARTBEAT_FRAME
+
+
+class StreamRegistry:
+    """Keeps recent EventBuffers so reconnecting clients can resume them."""
+
+    def __init__(self, ttl=REPLAY_TTL, max_streams=MAX_STREAMS):
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def create(self):
+        buffer = EventBuffer(uuid.uuid4().hex)
+        with self._lock:
+            self._evict()
+            self._streams[buffer.stream_id] = buffer
+        return buffer
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [sid for sid, b in self._streams.items()
+                   if b.finished_at is not None and now - b.finished_at > self.ttl]
+        for sid in expired:
+            del self._streams[sid]
+
+        if len(self._streams) >= self.max_streams:
+            finished = sorted((b.finished_at, sid) for sid, b in self._streams.items()
+                              if b.finished_at is not None)
+            for _, sid in finished[:len(self._streams) - self.max_streams + 1]:
+                del self._streams[sid]
+
+    def resume(self, last_event_id):
+        """Returns (buffer, sequence) for a Last-Event-ID value, or None."""
+        stream_id, _, seq = (last_event_id or "").partition(":")
+        if not seq.isdigit():
+            return None
+        with self._lock:
+            buffer = self._streams.get(stream_id)
+        if buffer is None:
+            return None
+        return buffer, int(seq)
+
+
+def start_stream(registry, produce):
+    """
+    Runs `produce(buffer)` on a background thread and returns the buffer.
+    The producer keeps going if the client disconnects, so the rest of the
+    answer is still available for a resumed connection.
+    """
+    buffer = registry.create()
+
+    def run():
+        try:
+            produce(buffer)
+        finally:
+            buffer.close()
+
+    threading.Thread(target=run, name=f"sse-{buffer.stream_id[:8]}", daemon=True).start()
+    return buffer
@@ -208,6 +208,31 @@ document.addEventListener("DOMContentLoaded", function() {
         chatBox.scrollTop = chatBox.scrollHeight;
     }
 
+    const TOOL_LABELS = {
+        search_trains: "Searching trains",
+        book_ticket: "Booking ticket",
+        find_connections: "Finding connections",
+        retrieve_guidelines: "Searching guidelines"
+    };
+
+    function showToolStatus(toolName, parentDiv) {
+        let status = parentDiv.querySelector('.tool-status');
+        if (!status) {
+            status = document.createElement("div");
+            status.className = "tool-status";
+            parentDiv.appendChild(status);
+        }
+        status.textContent = (TOOL_LABELS[toolName] || "Working") + "…";
+        chatBox.scrollTop = chatBox.scrollHeight;
+    }
+
+    function hideToolStatus(parentDiv) {
+        const status = parentDiv.querySelector('.tool-status');
+        if (status) status.remove();
+    }
+
+    const MAX_RESUME_ATTEMPTS = 3;
+
     async function sendMessageStream(text, trainId = null) {
         showTypingIndicator();
 
@@ -220,12 +245,19 @@ document.addEventListener("DOMContentLoaded", function() {
                 payload.train_id = selectedTrainId;
             }
 
-            const response = await fetch("/chat/stream", {
+            let response = await fetch("/chat/stream", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify(payload)
             });
 
+            if (response.status === 429) {
+                const retryAfter = response.headers.get("Retry-After") || "a few";
+                removeTypingIndicator();
+                addMessage(`RailBot is busy right now. Please try again in ${retryAfter} seconds.`, "bot");
+                return;
+            }
+
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
@@ -239,56 +271,105 @@ document.addEventListener("DOMContentLoaded", function() {
             botMessageDiv.appendChild(bubble);
             chatBox.appendChild(botMessageDiv);
 
-            const reader = response.body.getReader();
-            const decoder = new TextDecoder();
-            let buffer = '';
             let fullText = '';
+            let lastEventId = null;
+            let pendingEventId = null;
+            let finished = false;
+            let resumeAttempts = 0;
+
+            while (!finished) {
+                try {
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = '';
+                    pendingEventId = null;
 
-            while (true) {
-                const { done, value } = await reader.read();
+                    while (true) {
+                        const { done, value } = await reader.read();
                 
-                if (done) break;
+                        if (done) break;
 
-                buffer += decoder.decode(value, { stream: true });
-                const lines = buffer.split('\n');
-                buffer = lines.pop(); 
+                        buffer += decoder.decode(value, { stream: true });
+                        const lines = buffer.split('\n');
+                        buffer = lines.pop(); 
 
-                for (const line of lines) {
-                    if (line.startsWith('data: ')) {
-                        const jsonStr = line.slice(6);
+                        for (const line of lines) {
+                            if (line === '') {
+                                // Like EventSource, only a fully dispatched frame moves the resume point.
+                                if (pendingEventId !== null) {
+                                    lastEventId = pendingEventId;
+                                    pendingEventId = null;
+                                }
+                            } else if (line.startsWith('id: ')) {
+                                pendingEventId = line.slice(4);
+                            } else if (line.startsWith('data: ')) {
+                                const jsonStr = line.slice(6);
                         
-                        try {
-                            const data = JSON.parse(jsonStr);
+                                try {
+                                    const data = JSON.parse(jsonStr);
                             
-                            if (data.type === 'text') {
-                                fullText += data.content;
-                                bubble.innerHTML = marked.parse(fullText);
-                                chatBox.scrollTop = chatBox.scrollHeight;
-                            } else if (data.type === 'trains') {
-                                console.log("Trains data received:", data.content);
-                                showTrainCards(data.content, botMessageDiv);
-                                selectedTrainId = null;
-                                selectedTrainName = null;
-                                isBookingInProgress = false;
-                            } else if (data.type === 'ticket') {
-                                console.log("Ticket data received:", data.content);
-                                showTicketUI(data.content, botMessageDiv);
-                                selectedTrainId = null;
-                                selectedTrainName = null;
-                                isBookingInProgress = false;
+                                    if (data.type === 'text') {
+                                        fullText += data.content;
+                                        bubble.innerHTML = marked.parse(fullText);
+                                        chatBox.scrollTop = chatBox.scrollHeight;
+                                    } else if (data.type === 'trains') {
+                                        console.log("Trains data received:", data.content);
+                                        showTrainCards(data.content, botMessageDiv);
+                                        selectedTrainId = null;
+                                        selectedTrainName = null;
+                                        isBookingInProgress = false;
+                                    } else if (data.type === 'ticket') {
+                                        console.log("Ticket data received:", data.content);
+                                        showTicketUI(data.content, botMessageDiv);
+                                        selectedTrainId = null;
+                                        selectedTrainName = null;
+                                        isBookingInProgress = false;
                                 
-                                document.querySelectorAll('.select-train-btn').forEach(btn => {
-                                    btn.disabled = true;
-                                    btn.textContent = 'Booking Complete';
-                                    btn.style.opacity = '0.5';
-                                });
-                            } else if (data.type === 'done') {
-                                console.log("Streaming complete");
+                                        document.querySelectorAll('.select-train-btn').forEach(btn => {
+                                            btn.disabled = true;
+                                            btn.textContent = 'Booking Complete';
+                                            btn.style.opacity = '0.5';
+                                        });
+                                    } else if (data.type === 'tool_start') {
+                                        showToolStatus(data.content.name, botMessageDiv);
+                                    } else if (data.type === 'tool_end') {
+                                        hideToolStatus(botMessageDiv);
+                                    } else if (data.type === 'error') {
+                                        hideToolStatus(botMessageDiv);
+                                        finished = true;
+                                        fullText += (fullText ? "\n\n" : "") + data.content;
+                                        bubble.innerHTML = marked.parse(fullText);
+                                    } else if (data.type === 'done') {
+                                        finished = true;
+                                        console.log("Streaming complete");
+                                    }
+                                } catch (e) {
+                                    console.error("Error parsing SSE data:", e);
+                                }
                             }
-                        } catch (e) {
-                            console.error("Error parsing SSE data:", e);
                         }
                     }
+
+                    if (!finished) {
+                        throw new Error('Stream ended before completion');
+                    }
+                } catch (streamErr) {
+                    if (!lastEventId || resumeAttempts >= MAX_RESUME_ATTEMPTS) {
+                        throw streamErr;
+                    }
+                    resumeAttempts++;
+                    console.warn("Stream interrupted, resuming from", lastEventId);
+                    await new Promise(resolve => setTimeout(resolve, 500 * resumeAttempts));
+
+                    response = await fetch("/chat/stream", {
+                        method: "POST",
+                        headers: { "Content-Type": "application/json", "Last-Event-ID": lastEventId },
+                        body: JSON.stringify(payload)
+                    });
+
+                    if (!response.ok) {
+                        throw new Error('Stream could not be resumed');
+                    }
                 }
             }
 
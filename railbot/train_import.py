@@ -0,0 +1,249 @@
+import io
+import csv
+import json
+
+from sqlalchemy import insert
+
+from .models import db, Train
+
+TRAIN_FIELDS = ['name', 'start', 'end', 'departure',
+                'arrival', 'duration', 'seats', 'price']
+
+CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 500
+
+
+class ImportFormatError(ValueError):
+    """Raised when the request body cannot be parsed at all."""
+
+
+def _text_reader(stream, **kwargs):
+    if isinstance(stream, io.RawIOBase):
+        stream = io.BufferedReader(stream, READ_SIZE)
+    # utf-8-sig drops the BOM that Excel puts in front of exported CSVs.
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", **kwargs)
+
+
+def iter_json_array(stream):
+    """
+    Incrementally yields the objects of a top-level JSON array (or a single
+    top-level object) without loading the whole body into memory.
+    """
+    decoder = json.JSONDecoder()
+    reader = _text_reader(stream)
+    buffer = ""
+    pos = 0
+    started = False
+    single_object = False
+
+    def fill():
+        nonlocal buffer, pos
+        data = reader.read(READ_SIZE)
+        buffer = buffer[pos:] + data
+        pos = 0
+        return bool(data)
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if pos >= len(buffer):
+        raise ImportFormatError("Empty request body")
+
+    if buffer[pos] == "{":
+        single_object = True
+    elif buffer[pos] == "[":
+        pos += 1
+    else:
+        raise ImportFormatError("Expected a JSON array or object")
+
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            if single_object:
+                return
+            raise ImportFormatError("Unexpected end of JSON array")
+
+        if not single_object:
+            if buffer[pos] == "]":
+                return
+            if started:
+                if buffer[pos] != ",":
+                    raise ImportFormatError(f"Expected ',' in JSON array near: {buffer[pos:pos + 20]!r}")
+                pos += 1
+                skip_whitespace()
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError as e:
+                if not fill():
+                    raise ImportFormatError(f"Invalid JSON: {e.msg}") from e
+
+        pos = end
+        started = True
+        yield item
+
+        if single_object:
+            skip_whitespace()
+            if pos < len(buffer):
+                raise ImportFormatError("Unexpected data after JSON object")
+            return
+
+
+def iter_jsonl(stream):
+    """Yields one object per non-empty line. Bad lines are yielded as errors."""
+    reader = _text_reader(stream)
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ImportFormatError(f"Invalid JSON line: {e.msg}")
+
+
+def iter_csv(stream):
+    """Yields one dict per CSV row, using the header row for field names."""
+    reader = _text_reader(stream, newline="")
+    rows = csv.DictReader(reader)
+    if rows.fieldnames is None:
+        raise ImportFormatError("Empty CSV body")
+    missing = [f for f in TRAIN_FIELDS if f not in rows.fieldnames]
+    if missing:
+        raise ImportFormatError(f"Missing CSV columns: {', '.join(missing)}")
+    yield from rows
+
+
+def iter_rows(stream, content_type: str):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+
+    if content_type in ("text/csv", "application/csv"):
+        return iter_csv(stream)
+    if content_type in ("application/x-ndjson", "application/jsonl",
+                        "application/x-jsonlines", "application/ndjson"):
+        return iter_jsonl(stream)
+    if content_type in ("application/json", ""):
+        return iter_json_array(stream)
+
+    raise ImportFormatError(f"Unsupported content type: {content_type}")
+
+
+def validate_train(row) -> dict:
+    """
+    Returns a clean dict ready for insertion into the trains table,
+    or raises ValueError describing what is wrong with the row.
+    """
+    if isinstance(row, Exception):
+        raise ValueError(str(row))
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+
+    missing = [f for f in TRAIN_FIELDS if row.get(f) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    clean = {}
+    for field in ('name', 'start', 'end', 'departure', 'arrival', 'duration'):
+        value = str(row[field]).strip()
+        if len(value) > Train.__table__.c[field].type.length:
+            raise ValueError(f"Field too long: {field}")
+        clean[field] = value
+
+    try:
+        clean['seats'] = int(row['seats'])
+    except (TypeError, ValueError):
+        raise ValueError("seats must be an integer")
+    try:
+        clean['price'] = float(row['price'])
+    except (TypeError, ValueError):
+        raise ValueError("price must be a number")
+
+    if clean['seats'] < 0:
+        raise ValueError("seats cannot be negative")
+    if clean['price'] < 0:
+        raise ValueError("price cannot be negative")
+
+    return clean
+
+
+def import_trains(rows, atomic: bool = False, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Validates rows one at a time and inserts the valid ones with multi-row
+    INSERT statements of `chunk_size` rows.
+
+    With atomic=True everything is committed in a single transaction and any
+    invalid row or database error rolls back the whole import. Otherwise each
+    chunk is committed on its own, so a failing chunk only loses its own rows.
+    """
+    inserted = 0
+    failed = 0
+    errors = []
+    batch = []
+    batch_rows = []
+
+    def record_error(row_number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "error": message})
+
+    def flush():
+        nonlocal inserted
+        if not batch:
+            return
+        try:
+            db.session.execute(insert(Train), batch)
+            if not atomic:
+                db.session.commit()
+            inserted += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            if atomic:
+                raise
+            for row_number in batch_rows:
+                record_error(row_number, f"Database error: {e.__class__.__name__}")
+        batch.clear()
+        batch_rows.clear()
+
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                batch.append(validate_train(row))
+                batch_rows.append(row_number)
+            except ValueError as e:
+                record_error(row_number, str(e))
+                continue
+
+            if len(batch) >= chunk_size:
+                flush()
+
+        flush()
+        if atomic:
+            if failed:
+                db.session.rollback()
+                inserted = 0
+            else:
+                db.session.commit()
+    except ImportFormatError as e:
+        db.session.rollback()
+        if atomic:
+            inserted = 0
+        return {"inserted": inserted, "failed": failed, "errors": errors,
+                "fatal": str(e)}
+    except Exception as e:
+        db.session.rollback()
+        if atomic:
+            inserted = 0
+        return {"inserted": inserted, "failed": failed, "errors": errors,
+                "fatal": f"Database error: {e.__class__.__name__}"}
+
+    return {"inserted": inserted, "failed": failed, "errors": errors}
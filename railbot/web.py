@@ -0,0 +1,175 @@
+"""HTTP routes: the chat page, /chat/stream and the train CRUD/import API."""
+from flask import Blueprint, current_app, request, jsonify, render_template, redirect, url_for, Response
+
+from . import metrics, capture, sse, admission, catalog
+from .chat import ChatTurn, fast_path_reply
+from .models import db, Train, ChatHistory
+from .train_import import iter_rows, import_trains, ImportFormatError
+
+bp = Blueprint("web", __name__)
+
+chat_streams = sse.StreamRegistry()
+admission_controller = admission.AdmissionController()
+
+
+def event_stream_response(buffer, after=0):
+    return Response(buffer.read(after), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@bp.route('/', methods=['GET'])
+def home():
+    history = ChatHistory.query.order_by(ChatHistory.id.desc()).limit(10).all()
+    return render_template('index.html', chats=reversed(history))
+
+
+@bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id:
+        resumed = chat_streams.resume(last_event_id)
+        if resumed is None:
+            return jsonify({"error": "Stream expired, please resend your message."}), 410
+        print(f"[Chat] Resuming stream {last_event_id}")
+        return event_stream_response(*resumed)
+
+    user_input = request.json.get('message')
+    train_id = request.json.get('train_id')
+
+    client_id = admission.client_id_for(request)
+    try:
+        admission_controller.check_rate(client_id)
+        fast = fast_path_reply(user_input, train_id)
+        slot = None if fast else admission_controller.acquire(client_id)
+    except admission.Rejected as e:
+        print(f"[Admission] Rejected {client_id}: {e.reason}")
+        return jsonify({"error": e.reason}), 429, {"Retry-After": str(e.retry_after)}
+
+    # Until the producer thread is running, its finally can't return the slot.
+    try:
+        app = current_app._get_current_object()
+        trace = metrics.current_trace()
+        session_capture = capture.start_session(user_input, train_id)
+        turn = ChatTurn(user_input, train_id, session_capture)
+
+        def produce(buffer):
+            try:
+                with app.app_context(), metrics.use_trace(trace):
+                    for event_type, content in turn.events(fast):
+                        session_capture.event(event_type, content)
+                        buffer.push(event_type, content)
+            except Exception as e:
+                print(f"[Chat] Stream failed: {e}")
+                buffer.push("error", "Something went wrong. Please try again.")
+                buffer.push("done", None)
+            finally:
+                if slot is not None:
+                    slot.release()
+                turn.close()
+                metrics.finish_trace(trace)
+                session_capture.finish()
+
+        buffer = sse.start_stream(chat_streams, produce)
+    except BaseException:
+        if slot is not None:
+            slot.release()
+        raise
+    return event_stream_response(buffer)
+
+
+@bp.route('/clear_chat', methods=['POST'])
+def clear_chat():
+    db.session.query(ChatHistory).delete()
+    db.session.commit()
+    return redirect(url_for('web.home'))
+
+
+@bp.route('/api_clear_chat', methods=['POST'])
+def api_clear_chat():
+    db.session.query(ChatHistory).delete()
+    db.session.commit()
+    return jsonify({'success': True})
+
+
+def bulk_import_response(rows, atomic):
+    summary = import_trains(rows, atomic=atomic)
+    catalog.catalog_changed()
+    print(f"[Bulk Import] inserted={summary['inserted']} failed={summary['failed']}")
+    if "fatal" in summary:
+        return jsonify(summary), 400
+    if summary["failed"]:
+        # An atomic import is rolled back by any invalid row, so nothing was stored.
+        return jsonify(summary), 422 if atomic else 207
+    return jsonify(summary), 200
+
+
+@bp.route('/trains/bulk', methods=['POST'])
+def bulk_add_trains():
+    """
+    Streams a JSON array, JSONL (application/x-ndjson) or CSV (text/csv) body
+    into the trains table. Pass ?atomic=1 to import all-or-nothing; an
+    atomic import with invalid rows returns 422 and stores nothing.
+    """
+    atomic = request.args.get('atomic', '0').lower() in ('1', 'true', 'yes')
+    try:
+        rows = iter_rows(request.stream, request.content_type)
+    except ImportFormatError as e:
+        return jsonify({"error": str(e)}), 415
+
+    return bulk_import_response(rows, atomic)
+
+
+@bp.route('/trains', methods=['POST'])
+def add_train():
+    data = request.json
+    if isinstance(data, list):
+        return bulk_import_response(data, atomic=True)
+    required_fields = ['name', 'start', 'end', 'departure',
+                       'arrival', 'duration', 'seats', 'price']
+
+    missing = [field for field in required_fields if field not in data]
+    if missing:
+        return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+
+    new_train = Train(**{field: data[field] for field in required_fields})
+    db.session.add(new_train)
+    db.session.commit()
+    catalog.train_saved(new_train)
+
+    return jsonify({"message": "Train added", "id": new_train.id})
+
+
+@bp.route('/trains', methods=['GET'])
+def get_trains():
+    trains = Train.query.all()
+    output = []
+    for t in trains:
+        output.append({
+            "id": t.id,
+            "name": t.name,
+            "route": f"{t.start} -> {t.end}",
+            "timing": f"{t.departure} - {t.arrival}",
+            "seats": t.seats,
+            "price": t.price
+        })
+    return jsonify(output)
+
+
+@bp.route('/trains/<int:id>', methods=['PUT'])
+def update_train(id):
+    train = db.get_or_404(Train, id)
+    data = request.json
+    train.name = data.get('name', train.name)
+    train.seats = data.get('seats', train.seats)
+    db.session.commit()
+    catalog.train_saved(train)
+    return jsonify({"message": f"Train {id} updated"})
+
+
+@bp.route('/trains/<int:id>', methods=['DELETE'])
+def delete_train(id):
+    train = db.get_or_404(Train, id)
+    db.session.delete(train)
+    db.session.commit()
+    catalog.train_deleted(id)
+    return jsonify({"message": f"Train {id} deleted"})
@@ -0,0 +1,160 @@
+"""
+Replays captured /chat/stream sessions against a local server.
+
+Capture traffic first with CAPTURE_PATH=captures/chat.jsonl, then:
+
+    python replay.py captures/chat.jsonl --speed 4 --output replay.json
+
+The app is started on a local port with ReplayGenaiClient in place of
+Gemini, so each user message gets back the model turns that were
+recorded for it while tools, database and retrieval run for real.
+Sessions are sent with their original spacing divided by --speed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import urllib.request
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import benchmark
+
+
+def start_server(app, port):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def send_session(base_url, session):
+    payload = json.dumps(session["request"]).encode("utf-8")
+    req = urllib.request.Request(f"{base_url}/chat/stream", data=payload,
+                                 headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    ttfb = None
+    body = b""
+    status = None
+
+    try:
+        with urllib.request.urlopen(req, timeout=120) as response:
+            status = response.status
+            while True:
+                data = response.read1(65536)
+                if not data:
+                    break
+                body += data
+                if ttfb is None and b"data: " in body:
+                    ttfb = time.perf_counter() - started
+    except Exception as e:
+        return {"id": session["id"], "ok": False, "error": str(e),
+                "total": time.perf_counter() - started}
+
+    total = time.perf_counter() - started
+    return {
+        "id": session["id"],
+        "ok": status == 200 and b'"done"' in body,
+        "ttfb": ttfb or total,
+        "total": total,
+        "captured_ms": session.get("duration_ms"),
+        "events": body.count(b"data: "),
+    }
+
+
+def replay(base_url, sessions, speed, max_workers, repeat=1):
+    first = min(s["timestamp"] for s in sessions)
+    span = max(s["timestamp"] for s in sessions) - first
+    schedule = []
+    for loop in range(repeat):
+        for s in sessions:
+            schedule.append(((s["timestamp"] - first + loop * (span + 1)) / speed, s))
+    schedule.sort(key=lambda item: item[0])
+
+    started = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for offset, session in schedule:
+            wait = offset - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+            futures.append(pool.submit(send_session, base_url, session))
+        results = [f.result() for f in futures]
+    return results, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured chat sessions")
+    parser.add_argument("capture", help="JSONL file written with CAPTURE_PATH")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay N times faster than captured (arrivals and model delays)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the capture N times")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--database-url", default=None,
+                        help="database to replay against (default: seeded temporary SQLite)")
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--output", default=None, help="JSON results path")
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="railbot-replay-")
+    benchmark.prepare_environment(workdir)
+    os.environ.pop("CAPTURE_PATH", None)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, here)
+
+    from railbot import create_app
+    from railbot.capture import load_sessions
+    from bench.fake_genai import ReplayGenaiClient
+
+    sessions = load_sessions(args.capture)
+    if not sessions:
+        print(f"No sessions in {args.capture}")
+        return None
+
+    app = create_app()
+    replay_client = ReplayGenaiClient(sessions, speed=args.speed)
+    benchmark.install(app, replay_client, benchmark.Recorder(),
+                      os.path.join(here, "railway_guidelines.pdf"))
+
+    server = start_server(app, args.port)
+    try:
+        results, wall = replay(f"http://127.0.0.1:{args.port}", sessions,
+                               args.speed, args.workers, args.repeat)
+    finally:
+        server.shutdown()
+
+    ok = [r for r in results if r["ok"]]
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "capture": os.path.abspath(args.capture),
+        "speed": args.speed,
+        "sessions": len(results),
+        "errors": len(results) - len(ok),
+        "wall_time_s": round(wall, 3),
+        "requests_per_second": round(len(results) / wall, 2) if wall else None,
+        "ttfb": benchmark.summarize([r["ttfb"] for r in ok]),
+        "stream_time": benchmark.summarize([r["total"] for r in ok]),
+        "results": results,
+    }
+
+    print(f"sessions={report['sessions']} errors={report['errors']} "
+          f"rps={report['requests_per_second']} ttfb p50={report['ttfb'].get('p50_ms')}ms "
+          f"total p95={report['stream_time'].get('p95_ms')}ms")
+
+    output = args.output or f"replay-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import random
+
+from railbot.connections import ConnectionIndex, MINUTES_PER_DAY
+
+
+def make_trains(rows):
+    return [dict(train_id=i, name=f"T{i}", start=start, end=end, departure=departs,
+                 arrival="", duration=duration, seats=10, price=100)
+            for i, (start, end, departs, duration) in enumerate(rows, start=1)]
+
+
+def train_ids(journey):
+    return [leg.train_id for leg, _, _ in journey]
+
+
+def test_slow_journey_with_fewer_legs_survives_leg_cap():
+    trains = make_trains([
+        ("A", "B", "08:00", "1h"),
+        ("B", "D", "10:00", "10h"),
+        ("B", "C", "10:00", "1h"),
+        ("C", "C2", "11:30", "1h"),
+        ("C2", "D", "13:00", "1h"),
+    ])
+    index = ConnectionIndex(lambda: trains, min_transfer=30, max_legs=3)
+
+    assert [train_ids(j) for j in index.search("A", "D")] == [[1, 2]]
+
+    index = ConnectionIndex(lambda: trains, min_transfer=30, max_legs=4)
+    assert [train_ids(j) for j in index.search("A", "D")] == [[1, 3, 4, 5], [1, 2]]
+
+
+def fastest_by_brute_force(index, trains, origin, destination):
+    timetable = index._current()
+    best = None
+
+    def extend(station, ready, first_departure, legs):
+        nonlocal best
+        if legs == index.max_legs:
+            return
+        for leg in timetable.by_origin.get(station, ()):
+            for day in range(timetable.days):
+                departs = leg.departs + day * MINUTES_PER_DAY
+                if departs < ready:
+                    continue
+                start = departs if first_departure is None else first_departure
+                arrives = departs + leg.travel
+                if arrives - start > index.horizon:
+                    continue
+                if leg.destination == destination:
+                    best = arrives - start if best is None else min(best, arrives - start)
+                elif leg.destination != origin:
+                    extend(leg.destination, arrives + index.min_transfer, start, legs + 1)
+
+    for leg in timetable.by_origin.get(origin, ()):
+        if leg.destination == destination:
+            best = leg.travel if best is None else min(best, leg.travel)
+        elif leg.destination != origin:
+            extend(leg.destination, leg.departs + leg.travel + index.min_transfer,
+                   leg.departs, 1)
+    return best
+
+
+def test_fastest_journey_matches_brute_force():
+    rng = random.Random(7)
+    stations = "ABCDEFGH"
+    rows = []
+    for _ in range(40):
+        start, end = rng.sample(stations, 2)
+        departs = rng.randrange(0, MINUTES_PER_DAY, 15)
+        travel = rng.randrange(30, 600, 15)
+        rows.append((start, end, f"{departs // 60:02d}:{departs % 60:02d}",
+                     f"{travel // 60}h {travel % 60}m"))
+    trains = make_trains(rows)
+
+    for max_legs in (1, 2, 3):
+        index = ConnectionIndex(lambda: trains, max_legs=max_legs)
+        for origin in stations:
+            for destination in stations:
+                if origin == destination:
+                    continue
+                journeys = index.search(origin, destination, k=1)
+                found = journeys[0][-1][2] - journeys[0][0][1] if journeys else None
+                expected = fastest_by_brute_force(index, trains, origin.lower(), destination.lower())
+                assert found == expected, (max_legs, origin, destination)
+                assert all(len(j) <= max_legs for j in journeys)
+
+
+def test_patched_timetable_matches_full_rebuild():
+    trains = make_trains([
+        ("A", "B", "08:00", "1h"),
+        ("B", "C", "10:00", "2h"),
+        ("A", "C", "09:00", "6h"),
+    ])
+    moved = dict(trains[2], departure="07:00", duration="3h")
+    added = make_trains([("C", "D", "13:00", "1h")])[0]
+    added["train_id"] = 4
+
+    index = ConnectionIndex(lambda: trains)
+    index._current()
+    index.upsert(moved)
+    index.upsert(added)
+    index.remove(1)
+    patched = index._current()
+    rebuilt = ConnectionIndex(lambda: [trains[1], moved, added])._current()
+
+    assert patched.connections == rebuilt.connections
+    assert patched.legs == rebuilt.legs
+    assert ({key: sorted(leg.train_id for leg in legs) for key, legs in patched.by_origin.items()}
+            == {key: sorted(leg.train_id for leg in legs) for key, legs in rebuilt.by_origin.items()})
+    assert [train_ids(j) for j in index.search("A", "D")] == [[3, 4]]
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from railbot import llm
+
+
+class SlowChat:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def send_message_stream(self, message):
+        for chunk in ("first", "second"):
+            time.sleep(self.delay)
+            yield chunk
+
+
+class FakeClient:
+    def __init__(self, delay):
+        self.chats = self
+        self.delay = delay
+
+    def create(self, model, history=None, config=None):
+        return SlowChat(self.delay)
+
+
+def half_open_client(delay):
+    client = llm.ResilientClient(FakeClient(delay), fallbacks={},
+                                 first_token_timeout=5, idle_timeout=5)
+    breaker = client._breakers["model"] = llm.CircuitBreaker("model", failures=1, cooldown=0)
+    breaker.failure()
+    return client, breaker
+
+
+def test_trial_cut_by_turn_deadline_reopens_circuit():
+    client, breaker = half_open_client(delay=0.5)
+    chat = client.chats.create(model="model")
+
+    with pytest.raises(llm.TurnDeadlineExceeded):
+        list(chat.send_message_stream("hi", deadline=time.monotonic() + 0.05))
+
+    assert breaker.state == "open"
+    assert breaker.allow()
+
+
+def test_trial_closed_early_by_caller_reopens_circuit():
+    client, breaker = half_open_client(delay=0)
+    stream = client.chats.create(model="model").send_message_stream("hi")
+
+    assert next(stream) == "first"
+    stream.close()
+
+    assert breaker.state == "open"
+    assert breaker.allow()
+
+
+def test_successful_trial_closes_circuit():
+    client, breaker = half_open_client(delay=0)
+
+    assert list(client.chats.create(model="model").send_message_stream("hi")) == ["first", "second"]
+    assert breaker.state == "closed"
@@ -0,0 +1,67 @@
+import io
+import json
+
+import pytest
+
+from railbot import train_import
+from railbot.train_import import ImportFormatError, iter_csv, iter_json_array
+
+TRAIN = {"name": "Express", "start": "Chennai", "end": "Madurai", "departure": "06:00 AM",
+         "arrival": "02:00 PM", "duration": "08h 00m", "seats": 100, "price": 450.0}
+
+
+def body(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def test_object_split_across_reads(monkeypatch):
+    monkeypatch.setattr(train_import, "READ_SIZE", 16)
+    rows = [dict(TRAIN, name=f"Train {i}") for i in range(5)]
+
+    assert list(iter_json_array(body(json.dumps(rows)))) == rows
+
+
+def test_object_larger_than_read_size():
+    row = dict(TRAIN, name="x" * (train_import.READ_SIZE + 100))
+
+    assert list(iter_json_array(body(json.dumps([row, TRAIN])))) == [row, TRAIN]
+
+
+def test_empty_array():
+    assert list(iter_json_array(body(" [ ] "))) == []
+
+
+def test_single_top_level_object():
+    assert list(iter_json_array(body(json.dumps(TRAIN)))) == [TRAIN]
+
+
+def test_trailing_comma_is_rejected():
+    rows = iter_json_array(body(json.dumps([TRAIN])[:-1] + ",]"))
+
+    assert next(rows) == TRAIN
+    with pytest.raises(ImportFormatError):
+        next(rows)
+
+
+def test_truncated_body_is_rejected():
+    rows = iter_json_array(body(json.dumps([TRAIN, TRAIN])[:-20]))
+
+    assert next(rows) == TRAIN
+    with pytest.raises(ImportFormatError):
+        next(rows)
+
+
+def test_unterminated_array_is_rejected():
+    rows = iter_json_array(body(json.dumps([TRAIN])[:-1]))
+
+    assert next(rows) == TRAIN
+    with pytest.raises(ImportFormatError, match="Unexpected end"):
+        next(rows)
+
+
+def test_csv_with_byte_order_mark():
+    header = ",".join(train_import.TRAIN_FIELDS)
+    values = ",".join(str(TRAIN[field]) for field in train_import.TRAIN_FIELDS)
+    stream = io.BytesIO(f"\ufeff{header}\r\n{values}\r\n".encode("utf-8"))
+
+    assert [row["name"] for row in iter_csv(stream)] == ["Express"]